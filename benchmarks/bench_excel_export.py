@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'export Excel en flux contre l'export CSV
+
+Génère N propriétés synthétiques (avec champs imbriqués) via un générateur et
+mesure pour chaque format le temps d'écriture puis, dans une seconde passe,
+le pic mémoire (tracemalloc).
+
+Usage:
+    python benchmarks/bench_excel_export.py --rows 100000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import FIELDS_ORDER  # noqa: E402
+from excel_export import export_to_excel, flatten_value  # noqa: E402
+
+
+def synthetic_properties(count):
+    for n in range(count):
+        yield {
+            'id_propriete': f"prop-{n}",
+            'titre': f"Terrain {n} à vendre à Dakar",
+            'prix': f"{(n % 500 + 1) * 1000000} FCFA",
+            'localisation': f"Dakar, quartier {n % 40}",
+            'surface': f"{150 + n % 900} m²",
+            'description': "Terrain clôturé avec titre foncier, proche route bitumée. " * 3,
+            'nombre_images': n % 12,
+            'lien': f"https://keur-immo.com/propriete/{n}/",
+            'caracteristiques': ['clôturé', 'titre foncier'],
+            'caracteristiques_detaillees': {'Surface': f"{150 + n % 900} m²", 'Statut': 'titre foncier'},
+            'coordonnees': {'latitude': '14.69', 'longitude': '-17.44'},
+            'images': [f"https://keur-immo.com/images/{n}-{i}.jpg" for i in range(3)],
+            'proprietes_similaires': [{'titre': f"Terrain {n + 1}", 'lien': f"https://keur-immo.com/propriete/{n + 1}/"}],
+        }
+
+
+def write_csv(properties, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS_ORDER, extrasaction='ignore')
+        writer.writeheader()
+        for prop in properties:
+            writer.writerow({key: flatten_value(value) for key, value in prop.items()})
+
+
+def measure(label, func, rows, path):
+    start = time.perf_counter()
+    func(synthetic_properties(rows), path)
+    elapsed = time.perf_counter() - start
+
+    # Deuxième passe pour la mémoire: tracemalloc fausserait le chronométrage
+    tracemalloc.start()
+    func(synthetic_properties(rows), path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    print(f"{label}: {elapsed:.2f}s, pic mémoire {peak / 1024 / 1024:.1f} Mio, "
+          f"fichier {size / 1024 / 1024:.1f} Mio")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark export Excel vs CSV')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            print(f"--- {rows} propriétés ---")
+            measure('CSV ', write_csv, rows, os.path.join(tmp, 'export.csv'))
+            measure('XLSX', export_to_excel, rows, os.path.join(tmp, 'export.xlsx'))
+
+
+if __name__ == "__main__":
+    main()
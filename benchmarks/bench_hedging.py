@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark des requêtes hedgées sur un faux site avec des réponses lentes
+
+Une requête sur `--slow-every` répond en `--slow-latency` secondes. Compare la
+latence par page (p50, p95, p99, max) avec et sans hedging, dans deux cas:
+lenteur passagère (selon le rang de la requête, un doublon l'évite) et pages
+lentes (selon l'URL, un doublon est aussi lent et ne fait qu'ajouter de la
+charge).
+
+Usage:
+    python benchmarks/bench_hedging.py --requests 200 --slow-every 50 --slow-latency 3
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_site import FakeSite  # noqa: E402
+from keur_immo_scraper import KeurImmoScraper  # noqa: E402
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def bench(hedge, slow_by_url, args):
+    with FakeSite(latency=args.latency, slow_every=args.slow_every,
+                  slow_latency=args.slow_latency, slow_by_url=slow_by_url) as site:
+        scraper = KeurImmoScraper(hedge_requests=hedge)
+        durations = []
+        start = time.perf_counter()
+        for n in range(args.requests):
+            page_start = time.perf_counter()
+            scraper.get_page(f"{site.base_url}/propriete/{n}/")
+            durations.append(time.perf_counter() - page_start)
+        total = time.perf_counter() - start
+        server_requests = site.requests
+
+    print(f"  hedging {'activé ' if hedge else 'désactivé'}: total {total:.2f}s, "
+          f"p50 {percentile(durations, 50) * 1000:.0f} ms, p95 {percentile(durations, 95) * 1000:.0f} ms, "
+          f"p99 {percentile(durations, 99) * 1000:.0f} ms, max {max(durations) * 1000:.0f} ms, "
+          f"requêtes serveur {server_requests} (doublons: {scraper.hedge_count})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark des requêtes hedgées')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='Latence normale (s)')
+    parser.add_argument('--slow-every', type=int, default=50, help='Une requête lente toutes les N')
+    parser.add_argument('--slow-latency', type=float, default=3.0, help='Latence des requêtes lentes (s)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    for slow_by_url, label in ((False, "lenteur passagère (selon le rang de la requête)"),
+                               (True, "pages lentes (selon l'URL)")):
+        print(label)
+        bench(False, slow_by_url, args)
+        bench(True, slow_by_url, args)
+
+
+if __name__ == "__main__":
+    main()
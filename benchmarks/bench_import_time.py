@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Garde-fou sur le temps d'import des points d'entrée
+
+Importe chaque module dans un interpréteur neuf, vérifie que les dépendances
+lourdes (boto3, botocore, bs4) ne sont pas chargées à l'import et que le temps
+d'import médian reste sous le budget. Code de sortie 1 en cas de régression.
+
+Usage:
+    python benchmarks/bench_import_time.py --budget 0.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['scraper_handler', 'scraper_local', 'keur_immo_scraper']
+HEAVY_MODULES = {
+    'scraper_handler': ['boto3', 'botocore', 'bs4'],
+    'scraper_local': ['boto3', 'botocore', 'bs4'],
+    'keur_immo_scraper': ['boto3', 'botocore'],
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    samples, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES[module])],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['seconds'])
+        loaded = result['loaded']
+    return statistics.median(samples), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Garde-fou sur le temps d\'import')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.5, help='Temps d\'import médian maximum (s)')
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        seconds, loaded = measure(module, args.runs)
+        status = 'OK'
+        if loaded or seconds > args.budget:
+            status = 'RÉGRESSION'
+            failed = True
+        extra = f" - importés à tort: {', '.join(loaded)}" if loaded else ''
+        print(f"{module}: {seconds * 1000:.1f} ms [{status}]{extra}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mémoire de l'ensemble des URLs vues: SeenSet (Bloom + SQLite) contre set()
+
+Usage:
+    python benchmarks/bench_seen_set.py --urls 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl_frontier import SeenSet, normalize_url  # noqa: E402
+
+
+def urls(count):
+    for n in range(count):
+        yield f"https://keur-immo.com/propriete/terrain-{n}-a-vendre-dakar/"
+
+
+def fill(seen, count):
+    new = sum(1 for url in urls(count) if seen.add(url))
+    # Deuxième passage: toutes les URLs doivent être reconnues comme vues
+    again = sum(1 for url in urls(count) if seen.add(url))
+    return new, again
+
+
+def measure(label, factory, count):
+    seen = factory(count)
+    start = time.perf_counter()
+    new, again = fill(seen, count)
+    elapsed = time.perf_counter() - start
+    extra = f", faux positifs Bloom {seen.false_positives}" if hasattr(seen, 'false_positives') else ''
+    if hasattr(seen, 'close'):
+        seen.close()
+
+    # Mémoire Python retenue, mesurée dans une seconde passe (tracemalloc ralentit
+    # fortement; le cache de pages SQLite, borné, n'est pas compté)
+    tracemalloc.start()
+    seen = factory(count)
+    fill(seen, count)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if hasattr(seen, 'close'):
+        seen.close()
+
+    print(f"{label}: {current / 1024 / 1024:.1f} Mio, {elapsed:.1f}s, "
+          f"nouvelles {new}, redondantes acceptées {again}{extra}")
+
+
+class PlainSet(set):
+    def add(self, url):
+        url = normalize_url(url)
+        if url in self:
+            return False
+        super().add(url)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mémoire de l\'ensemble des URLs vues')
+    parser.add_argument('--urls', type=int, nargs='+', default=[100000])
+    args = parser.parse_args()
+
+    for count in args.urls:
+        print(f"--- {count} URLs ---")
+        measure('set()  ', lambda n: PlainSet(), count)
+        measure('SeenSet', lambda n: SeenSet(capacity=n), count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark du mode file de travail: 1 worker contre N workers sur un faux site local
+
+Avec --queue-url, la file est celle d'un serveur Redis (ex: redis-server
+local) au lieu d'un fichier SQLite: les scripts Lua du backend Redis sont
+ainsi exercés de bout en bout. Les clés de l'espace de noms sont effacées
+avant chaque mesure.
+
+Usage:
+    python benchmarks/bench_work_queue.py --workers 1 4 --pages 5 --per-page 10
+    python benchmarks/bench_work_queue.py --queue-url redis://localhost:6379/15
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_site import FakeSite  # noqa: E402
+import work_queue  # noqa: E402
+
+
+def bench(workers, pages, per_page, latency, queue_url=None):
+    with FakeSite(pages=pages, per_page=per_page, latency=latency) as site, \
+            tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'queue.sqlite')
+        queue = work_queue.open_queue(db, queue_url)
+        if queue_url:
+            for key in queue.redis.scan_iter(f"{queue.ns}:*"):
+                queue.redis.delete(key)
+        work_queue.seed(queue, site.listing_url)
+        queue.close()
+
+        start = time.perf_counter()
+        work_queue.run_workers(workers, db=db, url=queue_url, delay=0)
+        elapsed = time.perf_counter() - start
+
+        queue = work_queue.open_queue(db, queue_url)
+        count = len(queue.results('detail'))
+        stats = queue.stats()
+        queue.close()
+    if stats.get('failed') or stats.get('pending') or stats.get('leased'):
+        print(f"  état de la file inattendu: {stats}")
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='Latence (s) par requête')
+    parser.add_argument('--queue-url', default=None, help='URL Redis (ex: redis://localhost:6379/15)')
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        elapsed, count = bench(workers, args.pages, args.per_page, args.latency, args.queue_url)
+        baseline = baseline or elapsed
+        print(f"{workers} worker(s): {count} propriétés en {elapsed:.2f}s "
+              f"(x{baseline / elapsed:.1f})")
+
+
+if __name__ == "__main__":
+    main()
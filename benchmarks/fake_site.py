@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Faux site keur-immo.com servi en local pour les benchmarks
+
+Génère des pages de listing et des pages de détail synthétiques avec une
+latence configurable, sans jamais solliciter le vrai site.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+LISTING_PATH = "/senegal/terrains-a-vendre-dakar/"
+
+
+def listing_html(base_url, page, pages, per_page):
+    cards = []
+    for i in range(per_page):
+        n = (page - 1) * per_page + i
+        cards.append(f"""
+        <article id="prop-{n}">
+          <h3>Terrain {n} à vendre</h3>
+          <span class="price">{(n + 1) * 1000000} FCFA</span>
+          <span class="location">Dakar, quartier {n % 7}</span>
+          <span class="surface">{150 + n} m²</span>
+          <a href="{base_url}/propriete/{n}/">Voir</a>
+          <p class="description">Terrain clôturé avec titre foncier</p>
+          <img src="/images/{n}.jpg">
+        </article>""")
+    links = ''.join(f'<a href="?page={p}">{p}</a>' for p in range(1, pages + 1))
+    return f"<html><body>{''.join(cards)}<div class=\"pagination\">{links}</div></body></html>"
+
+
+def detail_html(base_url, n):
+    return f"""<html><body>
+      <div class="description">Description complète du terrain {n}. {'Lorem ipsum ' * 20}</div>
+      <span class="price">{(n + 1) * 1000000} FCFA</span>
+      <ul class="features"><li>Surface: {150 + n} m²</li><li>Statut: titre foncier</li></ul>
+      <div class="gallery"><img src="/images/{n}.jpg"><img src="/images/{n}-2.jpg"></div>
+      <div class="similar"><a href="{base_url}/propriete/{n + 1}/">Terrain {n + 1}</a></div>
+    </body></html>"""
+
+
+class FakeSite:
+    """
+    Serveur HTTP local; `latency` est ajoutée à chaque réponse
+
+    Une réponse sur `slow_every` prend `slow_latency` secondes: par défaut
+    selon le rang de la requête (lenteur passagère, qu'un doublon évite), ou
+    avec `slow_by_url` selon le numéro de la page de détail (page lente à
+    chaque requête, qu'un doublon ne peut pas accélérer).
+    """
+
+    def __init__(self, pages=5, per_page=10, latency=0.05, slow_every=0, slow_latency=0.0,
+                 slow_by_url=False):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.slow_by_url = slow_by_url
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.listing_url = f"{self.base_url}{LISTING_PATH}"
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                    count = site.requests
+                parsed = urlparse(self.path)
+                if site.slow_by_url:
+                    digits = parsed.path.strip('/').split('/')[-1]
+                    count = int(digits) + 1 if digits.isdigit() else 1
+                delay = site.latency
+                if site.slow_every and count % site.slow_every == 0:
+                    delay = site.slow_latency
+                time.sleep(delay)
+
+                if parsed.path == LISTING_PATH:
+                    page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+                    body = listing_html(site.base_url, page, site.pages, site.per_page)
+                elif parsed.path.startswith('/propriete/'):
+                    body = detail_html(site.base_url, int(parsed.path.strip('/').split('/')[-1]))
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Capture des changements entre deux runs de scraping
+
+Compare les annonces du run courant à l'état du run précédent (par clé
+d'annonce stable) et produit un fichier delta compact (ajoutées, retirées,
+prix modifiés) ainsi qu'un fichier d'historique des prix par run. L'état ne
+garde que le prix normalisé de chaque annonce ({clé: prix}), de sorte que sa
+taille ne dépend pas du détail des annonces.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+
+STATE_FILE = "annonces_state.json"
+PRICE_HISTORY_DIR = "historique_prix"
+
+# prix_normalise et prix_precedent sont tous deux des prix normalisés (chiffres
+# seuls), donc comparables; prix garde le texte brut de l'annonce
+DELTA_FIELDS = ['type_changement', 'cle', 'prix_normalise', 'prix_precedent']
+PRICE_HISTORY_FIELDS = ['cle', 'date', 'type_changement', 'prix_normalise', 'prix_precedent', 'prix', 'titre']
+
+
+def listing_key(record):
+    """Clé stable d'une annonce: lien, sinon identifiant, sinon titre + localisation"""
+    for field in ('lien', 'id_propriete'):
+        value = record.get(field)
+        if value and value != 'N/A':
+            return value
+    text = f"{record.get('titre') or ''}|{record.get('localisation') or ''}"
+    return hashlib.sha1(' '.join(text.lower().split()).encode('utf-8')).hexdigest()
+
+
+def normalize_price(prix):
+    """Ne garde que les chiffres du prix ('4.000.000Fr' -> '4000000')"""
+    if not prix or prix == 'N/A':
+        return None
+    digits = re.sub(r'\D', '', str(prix))
+    return digits or None
+
+
+def load_state(path):
+    """Charge l'état du run précédent ({clé: prix normalisé}); vide au premier run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(records, path):
+    """Enregistre le prix normalisé de chaque annonce du run courant comme état de référence"""
+    state = {listing_key(record): normalize_price(record.get('prix')) for record in records}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    return path
+
+
+def diff_listings(previous, records):
+    """
+    Compare l'état précédent aux annonces du run courant
+
+    Args:
+        previous (dict): état précédent {clé: prix normalisé}
+        records (list): annonces du run courant
+
+    Returns:
+        dict: listes 'ajoutees' et 'prix_modifies' (annonce + 'cle' et
+        'prix_normalise', avec 'prix_precedent' pour les prix modifiés) et
+        'retirees' ('cle' et 'prix_precedent' seulement, l'état ne gardant pas
+        le reste)
+    """
+    current = {listing_key(record): record for record in records}
+    delta = {'ajoutees': [], 'retirees': [], 'prix_modifies': []}
+
+    for key, record in current.items():
+        price = normalize_price(record.get('prix'))
+        if key not in previous:
+            delta['ajoutees'].append(dict(record, cle=key, prix_normalise=price))
+        elif previous[key] != price:
+            delta['prix_modifies'].append(dict(record, cle=key, prix_normalise=price, prix_precedent=previous[key]))
+
+    for key, price in previous.items():
+        if key not in current:
+            delta['retirees'].append({'cle': key, 'prix_precedent': price})
+
+    return delta
+
+
+def save_delta_csv(delta, path):
+    """Écrit le delta en CSV, une ligne par changement"""
+    rows = []
+    for change_type in ('ajoutees', 'retirees', 'prix_modifies'):
+        for record in delta[change_type]:
+            rows.append(dict(record, type_changement=change_type))
+
+    fieldnames = list(DELTA_FIELDS)
+    for row in rows:
+        fieldnames.extend(field for field in row if field not in fieldnames)
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def save_price_history(delta, directory, date):
+    """
+    Écrit les changements de prix du run dans <directory>/<date>.csv
+
+    Un fichier par run: l'historique complet est la concaténation des
+    fichiers du répertoire, sans jamais réécrire les runs précédents.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{date}.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=PRICE_HISTORY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for change_type in ('ajoutees', 'retirees', 'prix_modifies'):
+            for record in delta[change_type]:
+                writer.writerow(dict(record, date=date, type_changement=change_type))
+    return path
+
+
+def summarize(delta):
+    """Résumé court du delta pour les logs"""
+    return ', '.join(f"{len(records)} {change_type}" for change_type, records in delta.items())
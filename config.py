@@ -94,10 +94,23 @@ SCRAPING_CONFIG = {
     'delay_between_details': 2,   # secondes
     'max_retries': 3,
     'timeout': 10,  # secondes
+    'page_time_budget': 20,  # secondes par page, retries et backoff compris
+    'run_time_budget': None,  # secondes pour tout le run, None = illimité
+    'hedge_requests': True,  # doubler une requête plus lente que le p95 observé
+    'hedge_min_samples': 20,  # mesures nécessaires avant d'estimer le p95
+    'hedge_max_ratio': 0.05,  # part maximale de requêtes doublées (politesse)
     'max_properties_per_run': None,  # None = illimité
     'save_html_samples': True,
     'get_property_details': True,
+    'crawl_max_depth': 1,  # suivi des proprietes_similaires (0 = listings seulement)
+    'crawl_budget': None,  # pages de détail maximum par run, None = illimité
+    'crawl_categories': ['terrain'],  # liens prioritaires dans la frontière
+    'crawl_recent_days': 30,  # annonce "récemment mise à jour" si mise à jour depuis N jours
+    'bloom_capacity': 1000000,  # URLs attendues dans le filtre de Bloom
+    'bloom_error_rate': 0.001,
     'extract_images': True,
+    'download_images': False,  # stockage local des images (voir image_pipeline.py)
+    'image_workers': 4,
     'extract_coordinates': True
 }
 
@@ -116,6 +129,8 @@ OUTPUT_FILES = {
     'json': 'keur_immo_terrains_complet.json',
     'csv': 'keur_immo_terrains_complet.csv',
     'excel': 'keur_immo_terrains_complet.xlsx',
+    'stats': 'keur_immo_stats.sqlite',  # agrégats de marché (voir market_stats.py)
+    'known_urls': 'keur_immo_urls_connues.sqlite',  # pages de détail déjà visitées (runs précédents)
     'html_sample': 'page_sample.html',
     'log': 'scraping.log'
 }
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Frontière de crawl prioritaire et ensemble des URLs déjà vues
+
+Les liens `proprietes_similaires` d'une page de détail font découvrir des
+annonces que la pagination manque ou atteint tard. Ils sont mis dans une file
+de priorité (profondeur, annonce jamais visitée lors des runs précédents,
+annonce récemment mise à jour, catégorie recherchée) et dédupliqués par un
+filtre de Bloom compact en mémoire; comme un filtre de Bloom peut donner de
+faux positifs, un "déjà vu" est confirmé dans une table SQLite sur disque. La
+mémoire reste ainsi quasi constante, même avec des millions d'URLs.
+"""
+
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+from config import SCRAPING_CONFIG
+
+
+def normalize_url(url):
+    """Forme canonique d'une URL: sans fragment, schéma et hôte en minuscules"""
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+MONTHS = {
+    'janv': 1, 'févr': 2, 'fevr': 2, 'mars': 3, 'avr': 4, 'mai': 5, 'juin': 6,
+    'juil': 7, 'août': 8, 'aout': 8, 'sept': 9, 'oct': 10, 'nov': 11, 'déc': 12, 'dec': 12,
+}
+RELATIVE_UNITS = {'jour': 1, 'semaine': 7, 'mois': 30, 'an': 365}
+
+
+def parse_update_date(text, today=None):
+    """
+    Date d'une mention de mise à jour, None si elle n'est pas reconnue
+
+    Formats reconnus: 12/03/2025, 2025-03-12, 12 mars 2025, "il y a 3 jours",
+    "aujourd'hui", "hier".
+    """
+    if not text:
+        return None
+    text = str(text).lower()
+    today = today or date.today()
+    try:
+        match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', text)
+        if match:
+            return date(int(match[1]), int(match[2]), int(match[3]))
+        match = re.search(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})', text)
+        if match:
+            return date(int(match[3]), int(match[2]), int(match[1]))
+        match = re.search(r'(\d{1,2})(?:er)?\s+([a-zéûè]+)\.?\s+(\d{4})', text)
+        if match:
+            month = next((number for prefix, number in MONTHS.items() if match[2].startswith(prefix)), None)
+            if month:
+                return date(int(match[3]), month, int(match[1]))
+    except ValueError:
+        return None
+    match = re.search(r'il y a\s+(\d+)\s+(jour|semaine|mois|an)', text)
+    if match:
+        return today - timedelta(days=int(match[1]) * RELATIVE_UNITS[match[2]])
+    if "aujourd'hui" in text or "aujourd’hui" in text:
+        return today
+    if re.search(r'\bhier\b', text):
+        return today - timedelta(days=1)
+    return None
+
+
+def is_recent(text, days=None, today=None):
+    """True si la mention de mise à jour date d'au plus `days` jours"""
+    days = SCRAPING_CONFIG['crawl_recent_days'] if days is None else days
+    today = today or date.today()
+    updated = parse_update_date(text, today)
+    return updated is not None and (today - updated).days <= days
+
+
+class BloomFilter:
+    """Filtre de Bloom: taille fixe, aucun faux négatif, faux positifs ~error_rate"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hachage: k positions à partir de deux hachages de 64 bits
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class SeenSet:
+    """
+    URLs déjà vues: filtre de Bloom en mémoire, confirmé par SQLite sur disque
+
+    Sans chemin, la table est temporaire (un run); avec un chemin existant,
+    le filtre est reconstruit à l'ouverture à partir des URLs déjà stockées.
+    """
+
+    def __init__(self, path=None, capacity=None, error_rate=None):
+        capacity = capacity or SCRAPING_CONFIG['bloom_capacity']
+        self.bloom = BloomFilter(capacity, error_rate or SCRAPING_CONFIG['bloom_error_rate'])
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='keur_immo_seen_')
+            path = os.path.join(self._tmpdir.name, 'seen.sqlite')
+        self.conn = sqlite3.connect(path)
+        if self._tmpdir:
+            # Table de travail: durabilité inutile, on privilégie la vitesse d'insertion
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)")
+        self.count = 0
+        self.false_positives = 0
+        for (url,) in self.conn.execute("SELECT url FROM seen"):
+            self.bloom.add(url)
+            self.count += 1
+
+    def add(self, url):
+        """Marque l'URL comme vue; retourne True si elle ne l'était pas encore"""
+        url = normalize_url(url)
+        if url in self.bloom:
+            if self.conn.execute("SELECT 1 FROM seen WHERE url = ?", (url,)).fetchone():
+                return False
+            self.false_positives += 1
+        self.bloom.add(url)
+        self.conn.execute("INSERT OR IGNORE INTO seen (url) VALUES (?)", (url,))
+        self.count += 1
+        return True
+
+    def __contains__(self, url):
+        url = normalize_url(url)
+        return url in self.bloom and \
+            self.conn.execute("SELECT 1 FROM seen WHERE url = ?", (url,)).fetchone() is not None
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        if self._tmpdir:
+            self._tmpdir.cleanup()
+
+
+def link_priority(depth, link=None, recent=False, categories=None, new=False):
+    """
+    Priorité d'une URL (plus petit = plus urgent): d'abord la profondeur, puis
+    des bonus, du plus fort au plus faible, si l'annonce n'a été visitée par
+    aucun run précédent (new), si l'annonce qui l'a fait découvrir est
+    récemment mise à jour (recent) et si le lien correspond à une catégorie
+    recherchée. La somme des bonus reste inférieure à 1: une URL moins
+    profonde passe toujours en premier.
+    """
+    categories = SCRAPING_CONFIG['crawl_categories'] if categories is None else categories
+    priority = float(depth)
+    if new:
+        priority -= 0.45
+    if recent:
+        priority -= 0.3
+    if link and categories:
+        text = f"{link.get('lien', '')} {link.get('titre', '')}".lower()
+        if any(category.lower() in text for category in categories):
+            priority -= 0.15
+    return priority
+
+
+class CrawlFrontier:
+    """File de priorité des pages de détail à visiter, sans doublons"""
+
+    def __init__(self, max_depth=None, budget=None, seen=None):
+        self.max_depth = SCRAPING_CONFIG['crawl_max_depth'] if max_depth is None else max_depth
+        self.budget = SCRAPING_CONFIG['crawl_budget'] if budget is None else budget
+        self.seen = seen or SeenSet()
+        self.heap = []
+        self.popped = 0
+        self._counter = itertools.count()  # départage les priorités égales (ordre FIFO)
+
+    def push(self, url, data, depth=0, priority=None):
+        """Ajoute une URL si elle est nouvelle et dans la profondeur autorisée"""
+        if not url or url == 'N/A' or depth > self.max_depth:
+            return False
+        if not self.seen.add(url):
+            return False
+        priority = depth if priority is None else priority
+        heapq.heappush(self.heap, (priority, next(self._counter), depth, url, data))
+        return True
+
+    def pop(self):
+        """Prochaine (url, data, depth), ou None si la file est vide ou le budget atteint"""
+        if not self.heap or (self.budget is not None and self.popped >= self.budget):
+            return None
+        _, _, depth, url, data = heapq.heappop(self.heap)
+        self.popped += 1
+        return url, data, depth
+
+    def __len__(self):
+        return len(self.heap)
+
+    def close(self):
+        self.seen.close()
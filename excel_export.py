@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Export Excel (.xlsx) en flux, à mémoire constante
+
+Le fichier xlsx est écrit directement (archive zip + XML SpreadsheetML), sans
+dépendance externe: chaque ligne est sérialisée puis écrite dans la feuille au
+fur et à mesure, et les textes sont stockés en ligne (inlineStr) plutôt que
+dans une table de chaînes partagées qui grossirait avec les données. Les
+colonnes suivent config.FIELDS_ORDER; les listes et dictionnaires imbriqués
+(caracteristiques_detaillees, coordonnees, proprietes_similaires...) sont
+aplatis en texte lisible. En entrée CSV (KeurImmoScraper.save_to_csv), ces
+champs sont écrits sous forme de repr Python ("{'Surface': ...}"): ils sont
+relus comme des littéraux avant d'être aplatis.
+
+Usage:
+    python excel_export.py keur_immo_terrains.json
+    python excel_export.py keur_immo_terrains.csv keur_immo_terrains_complet.xlsx
+"""
+
+import ast
+import csv
+import json
+import logging
+import re
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+from config import FIELDS_ORDER, OUTPUT_FILES
+
+logger = logging.getLogger(__name__)
+
+MAX_CELL_LENGTH = 32767  # limite d'Excel par cellule
+# Caractères de contrôle interdits en XML 1.0
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Style 0: normal; style 1: en-tête en gras
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+SHEET_HEADER = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>
+<sheetData>"""
+
+SHEET_FOOTER = "</sheetData></worksheet>"
+
+
+def column_letter(index):
+    """Lettre de colonne Excel pour un index commençant à 0 (0 -> A, 26 -> AA)"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def flatten_value(value):
+    """
+    Aplatit une valeur imbriquée en texte pour une cellule
+
+    - dict: "clé: valeur; clé: valeur" (ex: caracteristiques_detaillees)
+    - liste de dicts avec titre/lien: "titre (lien) | ..." (proprietes_similaires)
+    - liste: éléments séparés par " | " (images, caracteristiques)
+    """
+    if isinstance(value, dict):
+        return '; '.join(f"{key}: {flatten_value(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        parts = []
+        for item in value:
+            if isinstance(item, dict) and 'lien' in item:
+                parts.append(f"{item.get('titre', '')} ({item['lien']})".strip())
+            else:
+                parts.append(flatten_value(item))
+        return ' | '.join(parts)
+    return value
+
+
+def parse_csv_value(value):
+    """Relit une liste ou un dictionnaire écrit en repr Python dans un CSV; sinon la valeur telle quelle"""
+    if isinstance(value, str) and value[:1] in ('[', '{'):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+    return value
+
+
+def _cell(ref, value, style=0):
+    style_attr = f' s="{style}"' if style else ''
+    value = flatten_value(value)
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{style_attr}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    text = _ILLEGAL_XML_CHARS.sub('', str(value))[:MAX_CELL_LENGTH]
+    return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+class ExcelStreamWriter:
+    """
+    Écrivain xlsx ligne par ligne (une feuille), à utiliser comme contexte:
+
+        with ExcelStreamWriter('sortie.xlsx', FIELDS_ORDER) as writer:
+            for row in rows:
+                writer.writerow(row)
+    """
+
+    def __init__(self, path, fieldnames, sheet_name='Annonces'):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.sheet_name = sheet_name
+        self.columns = [column_letter(i) for i in range(len(self.fieldnames))]
+        self.rows_written = 0
+        self._zip = None
+        self._sheet = None
+
+    def __enter__(self):
+        self._zip = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED,
+                                    compresslevel=1)
+        self._zip.writestr('[Content_Types].xml', CONTENT_TYPES)
+        self._zip.writestr('_rels/.rels', ROOT_RELS)
+        self._zip.writestr('xl/workbook.xml', WORKBOOK.format(sheet_name=escape(self.sheet_name[:31])))
+        self._zip.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        self._zip.writestr('xl/styles.xml', STYLES)
+        # La feuille est écrite en flux: seule la ligne courante est en mémoire
+        self._sheet = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._sheet.write(SHEET_HEADER.encode('utf-8'))
+        self._write_row(self.fieldnames, style=1)
+        return self
+
+    def _write_row(self, values, style=0):
+        row_number = self.rows_written + 1
+        cells = ''.join(
+            _cell(f"{column}{row_number}", value, style) for column, value in zip(self.columns, values)
+        )
+        self._sheet.write(f'<row r="{row_number}">{cells}</row>'.encode('utf-8'))
+        self.rows_written += 1
+
+    def writerow(self, row):
+        """Écrit une propriété (dict); les champs absents donnent une cellule vide"""
+        self._write_row([row.get(field) for field in self.fieldnames])
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def __exit__(self, *exc):
+        self._sheet.write(SHEET_FOOTER.encode('utf-8'))
+        self._sheet.close()
+        self._zip.close()
+
+
+def export_to_excel(properties, filename=None, fieldnames=None):
+    """
+    Exporte des propriétés vers un fichier xlsx
+
+    Args:
+        properties (iterable): propriétés (dicts); un générateur garde la mémoire constante
+        filename (str, optional): fichier de sortie. Par défaut: OUTPUT_FILES['excel']
+        fieldnames (list, optional): colonnes. Par défaut: FIELDS_ORDER
+
+    Returns:
+        int: nombre de propriétés exportées
+    """
+    filename = filename or OUTPUT_FILES['excel']
+    with ExcelStreamWriter(filename, fieldnames or FIELDS_ORDER) as writer:
+        writer.writerows(properties)
+    count = writer.rows_written - 1
+    logger.info(f"{count} propriétés exportées dans {filename}")
+    return count
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print(__doc__.strip().split('Usage:')[1])
+        sys.exit(1)
+
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_FILES['excel']
+    if source.endswith('.csv'):
+        # Le CSV est lu ligne par ligne, sans le charger entièrement
+        with open(source, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            fields = [field for field in FIELDS_ORDER if field in reader.fieldnames] or reader.fieldnames
+            rows = ({field: parse_csv_value(value) for field, value in row.items()} for row in reader)
+            export_to_excel(rows, output, fields)
+    else:
+        with open(source, encoding='utf-8') as f:
+            export_to_excel(json.load(f), output)
+
+
+if __name__ == "__main__":
+    main()
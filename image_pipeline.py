@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Téléchargement des images d'annonces dans un stockage adressé par contenu
+
+Les images (`images` et `galerie_images`) sont téléchargées en parallèle sous
+un budget de requêtes par seconde, par défaut le même rythme que le scraper
+(1 / SCRAPING_CONFIG['delay_between_requests']). Chaque fichier est stocké une seule fois
+sous son empreinte SHA-256, une URL déjà vue n'est pas retéléchargée, et un
+hash perceptuel (dHash) repère la même photo réutilisée par des annonces en
+double. Les miniatures et le hash perceptuel nécessitent Pillow
+(`pip install Pillow`); sans Pillow les images sont stockées sans eux.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from change_capture import listing_key
+from config import HTTP_HEADERS, SCRAPING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = os.environ.get("IMAGES_DIR", "images")
+THUMBNAIL_SIZE = (200, 200)
+PHASH_MAX_DISTANCE = 6  # bits différents tolérés entre deux photos "identiques"
+PHASH_BITS = 64
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow est optionnel
+    Image = None
+
+
+class RateLimiter:
+    """Limite le débit global de requêtes, partagé entre les threads"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def dhash(image, size=8):
+    """Hash perceptuel par différence (64 bits) d'une image Pillow"""
+    gray = image.convert('L').resize((size + 1, size))
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def phash_bands(phash, bands=PHASH_MAX_DISTANCE + 1, bits=PHASH_BITS):
+    """
+    Découpe un hash en `bands` tranches de bits, (index, valeur) pour chacune
+
+    Avec PHASH_MAX_DISTANCE + 1 tranches, deux hashs à distance au plus
+    PHASH_MAX_DISTANCE ont au moins une tranche identique (principe des
+    tiroirs): il suffit de comparer les hashs qui partagent une tranche.
+    """
+    value = int(phash, 16)
+    result = []
+    start = 0
+    for band in range(bands):
+        width = bits // bands + (band < bits % bands)
+        result.append((band, (value >> start) & ((1 << width) - 1)))
+        start += width
+    return result
+
+
+class ImageStore:
+    """
+    Stockage des images adressé par contenu
+
+    Arborescence:
+        objects/ab/abcdef....jpg   image originale (nommée par SHA-256)
+        thumbs/abcdef....jpg       miniature
+        index.json                 URL -> SHA-256, et métadonnées par image
+    """
+
+    def __init__(self, root=IMAGES_DIR, workers=None, requests_per_second=None):
+        self.root = root
+        self.workers = workers or SCRAPING_CONFIG.get('image_workers', 4)
+        if requests_per_second is None:
+            # Même politesse que le scraper: une requête par delay_between_requests
+            delay = SCRAPING_CONFIG['delay_between_requests']
+            requests_per_second = 1.0 / delay if delay else 0
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'thumbs'), exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        else:
+            index = {}
+        self.urls = index.get('urls', {})
+        self.objects = index.get('objects', {})
+        # Index des hashs perceptuels par tranche: (tranche, valeur) -> SHA-256
+        self.phash_buckets = defaultdict(list)
+        for digest, meta in self.objects.items():
+            if meta.get('phash'):
+                self._index_phash(meta['phash'], digest)
+
+        if Image is None:
+            logger.warning("Pillow non installé: ni hash perceptuel ni miniatures")
+
+    def _session(self):
+        # Une session par thread: requests.Session n'est pas garanti thread-safe
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+            self._local.session.headers.update(HTTP_HEADERS)
+        return self._local.session
+
+    def save_index(self):
+        with self.lock:
+            index = {'urls': self.urls, 'objects': self.objects}
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _index_phash(self, phash, digest):
+        for band in phash_bands(phash):
+            self.phash_buckets[band].append(digest)
+
+    def _find_similar(self, phash, digest):
+        """Image déjà stockée proche au sens du dHash; seuls les hashs partageant une tranche sont comparés"""
+        checked = {digest}
+        for band in phash_bands(phash):
+            for other_digest in self.phash_buckets.get(band, ()):
+                if other_digest in checked:
+                    continue
+                checked.add(other_digest)
+                meta = self.objects[other_digest]
+                if hamming_distance(phash, meta['phash']) <= PHASH_MAX_DISTANCE:
+                    return meta.get('doublon_de') or other_digest
+        return None
+
+    def _store(self, url, content):
+        digest = hashlib.sha256(content).hexdigest()
+        with self.lock:
+            self.urls[url] = digest
+            if digest in self.objects:
+                return digest
+
+        ext = os.path.splitext(url.split('?')[0])[1].lower() or '.jpg'
+        object_path = os.path.join(self.root, 'objects', digest[:2], f"{digest}{ext}")
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with open(object_path, 'wb') as f:
+            f.write(content)
+        meta = {'chemin': os.path.relpath(object_path, self.root), 'taille': len(content)}
+
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(content)) as image:
+                    meta['phash'] = dhash(image)
+                    thumbnail = image.convert('RGB')
+                    thumbnail.thumbnail(THUMBNAIL_SIZE)
+                    thumb_path = os.path.join(self.root, 'thumbs', f"{digest}.jpg")
+                    thumbnail.save(thumb_path, 'JPEG', quality=80)
+                    meta['miniature'] = os.path.relpath(thumb_path, self.root)
+            except Exception as e:
+                logger.warning(f"Image illisible {url}: {e}")
+
+        with self.lock:
+            if meta.get('phash'):
+                similar = self._find_similar(meta['phash'], digest)
+                if similar:
+                    meta['doublon_de'] = similar
+                self._index_phash(meta['phash'], digest)
+            self.objects[digest] = meta
+        return digest
+
+    def fetch(self, url):
+        """Télécharge une image (si l'URL est inconnue) et retourne son SHA-256"""
+        with self.lock:
+            if url in self.urls:
+                return self.urls[url]
+
+        self.rate_limiter.wait()
+        try:
+            response = self._session().get(url, timeout=SCRAPING_CONFIG['timeout'])
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Image non récupérée {url}: {e}")
+            return None
+        return self._store(url, response.content)
+
+    def fetch_all(self, urls):
+        """Télécharge un lot d'URLs en parallèle; chaque URL distincte une seule fois"""
+        unique_urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            digests = dict(zip(unique_urls, executor.map(self.fetch, unique_urls)))
+        self.save_index()
+        return digests
+
+    def attach_to_properties(self, properties):
+        """
+        Télécharge les images de toutes les propriétés et ajoute à chacune
+        `images_locales` (SHA-256 des images) et `images_doublons` (images déjà
+        vues pour une autre annonce: même fichier, ou photo proche au sens du
+        hash perceptuel)
+
+        La première annonce qui utilise une image est mémorisée dans l'index
+        (`annonce`), d'un run à l'autre.
+        """
+        urls = []
+        for prop in properties:
+            urls.extend(prop.get('images', []))
+            urls.extend(prop.get('galerie_images', []))
+        digests = self.fetch_all(urls)
+
+        for prop in properties:
+            local = []
+            for url in prop.get('images', []) + prop.get('galerie_images', []):
+                digest = digests.get(url)
+                if digest and digest not in local:
+                    local.append(digest)
+            prop['images_locales'] = local
+
+            key = listing_key(prop)
+            duplicates = []
+            for digest in local:
+                meta = self.objects.get(digest, {})
+                if meta.setdefault('annonce', key) != key:
+                    duplicates.append(digest)  # même fichier déjà utilisé par une autre annonce
+                if meta.get('doublon_de'):
+                    duplicates.append(meta['doublon_de'])
+            prop['images_doublons'] = list(dict.fromkeys(duplicates))
+        self.save_index()
+
+        logger.info(f"{len(digests)} URLs d'images traitées, {len(self.objects)} images stockées")
+        return properties
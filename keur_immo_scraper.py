@@ -11,9 +11,13 @@ import csv
 from urllib.parse import urljoin, urlparse
 import logging
 import os
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-from datetime import datetime
+import queue
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from config import OUTPUT_FILES, SCRAPING_CONFIG
+from crawl_frontier import CrawlFrontier, SeenSet, is_recent, link_priority
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -49,6 +53,7 @@ def upload_to_s3(file_path, bucket_name=None, object_name=None):
         else:
             full_key = f"{S3_KEY_PREFIX}{object_name}"
             
+        import boto3  # import différé: coûteux et inutile sans upload S3
         s3 = boto3.client('s3')
         s3.upload_file(file_path, bucket_name, full_key)
         logger.info(f"Fichier uploadé avec succès vers: s3://{bucket_name}/{full_key}")
@@ -58,27 +63,161 @@ def upload_to_s3(file_path, bucket_name=None, object_name=None):
         logger.error(f"Erreur lors de l'upload vers S3: {str(e)}")
         return False
 
+class LatencyTracker:
+    """Latences des dernières requêtes réussies, pour estimer les percentiles"""
+    
+    def __init__(self, window=200, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+    
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+    
+    def percentile(self, p):
+        """Percentile p (0-100) des latences, None tant qu'il y a trop peu de mesures"""
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
 class KeurImmoScraper:
-    def __init__(self):
+    def __init__(self, page_time_budget=None, run_time_budget=None, hedge_requests=None):
         self.base_url = "https://keur-immo.com"
         self.target_url = "https://keur-immo.com/senegal/terrains-a-vendre-dakar/"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        self._sessions = queue.LifoQueue()  # sessions libres, réutilisées entre requêtes
         self.properties = []
+        
+        # Budgets de temps (secondes) par page et pour tout le run
+        self.timeout = SCRAPING_CONFIG['timeout']
+        self.page_time_budget = page_time_budget or SCRAPING_CONFIG['page_time_budget']
+        self.run_time_budget = run_time_budget or SCRAPING_CONFIG['run_time_budget']
+        self.run_deadline = None
+        
+        # Requêtes "hedgées": un doublon est envoyé si la réponse dépasse le p95 observé
+        self.hedge_requests = SCRAPING_CONFIG['hedge_requests'] if hedge_requests is None else hedge_requests
+        self.latencies = LatencyTracker(min_samples=SCRAPING_CONFIG['hedge_min_samples'])
+        self.request_count = 0
+        self.hedge_count = 0
+    
+    def start_run(self):
+        """Démarre le chronomètre du budget de temps global du run"""
+        if self.run_time_budget:
+            self.run_deadline = time.monotonic() + self.run_time_budget
+    
+    def run_budget_exhausted(self):
+        return self.run_deadline is not None and time.monotonic() >= self.run_deadline
+    
+    def _acquire_session(self):
+        # Une session n'est jamais utilisée par deux requêtes en même temps:
+        # requests.Session n'est pas garanti thread-safe
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            return session
+    
+    def _get(self, url, timeout):
+        """GET avec une session réservée à cette requête; retourne (réponse, durée)"""
+        session = self._acquire_session()
+        try:
+            start = time.monotonic()
+            response = session.get(url, timeout=timeout)
+            return response, time.monotonic() - start
+        finally:
+            self._sessions.put(session)
+    
+    def _start_get(self, url, timeout, results):
+        """Lance la requête dans son propre thread; le résultat arrive dans `results`"""
+        def run():
+            try:
+                results.put((*self._get(url, timeout), None))
+            except Exception as e:  # toujours un résultat, sinon fetch attendrait en vain
+                results.put((None, None, e))
+        
+        self.request_count += 1
+        threading.Thread(target=run, name='hedge', daemon=True).start()
+    
+    def _hedge_allowed(self):
+        # Politesse: les doublons restent une petite fraction du total des requêtes
+        return self.hedge_count < max(1, self.request_count * SCRAPING_CONFIG['hedge_max_ratio'])
+    
+    def fetch(self, url, timeout):
+        """
+        Requête GET avec hedging: si aucune réponse n'est arrivée au bout du
+        p95 des latences observées, un unique doublon est envoyé et la
+        première réponse reçue est retenue
+
+        Chaque requête hedgée a son propre thread et sa propre session: la
+        requête perdante est abandonnée sans bloquer les suivantes, et seule la
+        latence de la gagnante est enregistrée. L'attente totale est bornée
+        par `timeout` (le temps restant sur le budget de la page): au-delà,
+        requests.Timeout est levée et les requêtes en cours sont abandonnées.
+        """
+        hedge_delay = self.latencies.percentile(95) if self.hedge_requests else None
+        if hedge_delay is None or hedge_delay >= timeout:
+            self.request_count += 1
+            response, elapsed = self._get(url, timeout)
+            self.latencies.add(elapsed)
+            return response
+        
+        deadline = time.monotonic() + timeout
+        
+        def next_outcome():
+            try:
+                return results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise requests.Timeout(f"Aucune réponse dans le budget de temps ({timeout:.1f}s): {url}")
+        
+        results = queue.Queue()
+        self._start_get(url, timeout, results)
+        pending = 1
+        try:
+            outcome = results.get(timeout=hedge_delay)
+        except queue.Empty:
+            if self._hedge_allowed():
+                self.hedge_count += 1
+                pending += 1
+                logger.debug(f"Requête hedgée après {hedge_delay:.2f}s: {url}")
+                self._start_get(url, timeout - hedge_delay, results)
+            outcome = next_outcome()
+        
+        while True:
+            response, elapsed, error = outcome
+            pending -= 1
+            if response is not None:
+                self.latencies.add(elapsed)
+                return response
+            if not pending:
+                raise error
+            outcome = next_outcome()
     
     def get_page(self, url, retries=3):
-        """Récupère une page avec gestion des erreurs et retry"""
+        """Récupère une page avec gestion des erreurs, retry et budget de temps"""
+        deadline = time.monotonic() + self.page_time_budget
+        if self.run_deadline is not None:
+            deadline = min(deadline, self.run_deadline)
+        
         for attempt in range(retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"Budget de temps épuisé pour {url}")
+                return None
             try:
-                response = self.session.get(url, timeout=10)
+                response = self.fetch(url, timeout=min(self.timeout, remaining))
                 response.raise_for_status()
                 return response
             except requests.RequestException as e:
                 logger.warning(f"Tentative {attempt + 1} échouée pour {url}: {e}")
                 if attempt < retries - 1:
-                    time.sleep(2 ** attempt)  # Backoff exponentiel
+                    # Backoff exponentiel, borné par le temps restant
+                    time.sleep(max(0, min(2 ** attempt, deadline - time.monotonic())))
                 else:
                     logger.error(f"Impossible de récupérer {url} après {retries} tentatives")
                     return None
@@ -237,6 +376,10 @@ class KeurImmoScraper:
         
         return data if data['titre'] != 'N/A' else None
     
+    def parse_html(self, content):
+        """Construit l'arbre HTML d'une page (listing ou détail)"""
+        return BeautifulSoup(content, 'html.parser')
+    
     def get_detailed_property_info(self, property_url):
         """Récupère les détails complets d'une propriété depuis sa page dédiée"""
         if property_url == 'N/A':
@@ -246,7 +389,7 @@ class KeurImmoScraper:
         if not response:
             return {}
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = self.parse_html(response.content)
         details = {}
         
         # Description complète
@@ -347,6 +490,31 @@ class KeurImmoScraper:
         
         return details
     
+    def fill_from_details(self, data):
+        """
+        Complète une propriété découverte via les propriétés similaires (qui
+        n'a pas de carte de listing) avec les champs de sa page de détail:
+        prix, surface, localisation et type
+        """
+        characteristics = {key.lower(): value for key, value in
+                           (data.get('caracteristiques_detaillees') or {}).items()}
+        
+        def characteristic(*keywords):
+            return next((value for key, value in characteristics.items()
+                         if any(keyword in key for keyword in keywords) and value), None)
+        
+        fields = {
+            'prix': data.get('prix_detaille') or characteristic('prix', 'montant'),
+            'surface': characteristic('surface', 'superficie'),
+            'localisation': characteristic('localisation', 'adresse', 'quartier', 'ville', 'zone'),
+            'type': characteristic('type'),
+            'description': data.get('description_complete'),
+        }
+        for field, value in fields.items():
+            if data.get(field) in (None, '', 'N/A'):
+                data[field] = value or 'N/A'
+        return data
+    
     def get_total_pages(self, soup):
         """Détermine le nombre total de pages"""
         pagination = soup.find(class_=['pagination', 'pager'])
@@ -359,9 +527,10 @@ class KeurImmoScraper:
                     pass
         return 1
     
-    def scrape_all_pages(self, get_details=True):
+    def scrape_all_pages(self, get_details=True, crawl_depth=None, crawl_budget=None):
         """Scrape toutes les pages de résultats avec option pour les détails complets"""
         logger.info(f"Début du scraping de {self.target_url}")
+        self.start_run()
         
         # Première page pour déterminer le nombre total
         response = self.get_page(self.target_url)
@@ -369,7 +538,7 @@ class KeurImmoScraper:
             logger.error("Impossible de récupérer la première page")
             return
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = self.parse_html(response.content)
         
         # Extraire les propriétés de la première page
         properties = self.parse_property_listing(soup)
@@ -382,12 +551,15 @@ class KeurImmoScraper:
         
         # Scraper les pages suivantes
         for page_num in range(2, total_pages + 1):
+            if self.run_budget_exhausted():
+                logger.warning(f"Budget de temps du run épuisé à la page {page_num}/{total_pages}")
+                break
             page_url = f"{self.target_url}?page={page_num}"
             logger.info(f"Scraping page {page_num}/{total_pages}")
             
             response = self.get_page(page_url)
             if response:
-                soup = BeautifulSoup(response.content, 'html.parser')
+                soup = self.parse_html(response.content)
                 properties = self.parse_property_listing(soup)
                 self.properties.extend(properties)
                 logger.info(f"Page {page_num}: {len(properties)} propriétés trouvées")
@@ -401,21 +573,75 @@ class KeurImmoScraper:
         if get_details and self.properties:
             logger.info("Récupération des détails complets pour chaque propriété...")
             
-            for i, property_data in enumerate(self.properties):
-                logger.info(f"Détails {i+1}/{len(self.properties)}: {property_data.get('titre', 'N/A')}")
-                
-                # Récupérer les détails complets
-                detailed_info = self.get_detailed_property_info(property_data.get('lien', 'N/A'))
+            self.crawl_details(max_depth=crawl_depth, budget=crawl_budget)
+            
+            logger.info("Récupération des détails terminée")
+        
+        logger.info(f"Scraping complet terminé. Total: {len(self.properties)} propriétés avec détails")
+        if self.hedge_count:
+            logger.info(f"Requêtes hedgées: {self.hedge_count}/{self.request_count}")
+    
+    def crawl_details(self, max_depth=None, budget=None, known_urls=None):
+        """
+        Récupère les détails via une frontière de crawl prioritaire
+        
+        Les propriétés des listings sont visitées d'abord (profondeur 0), dans
+        l'ordre. Les liens proprietes_similaires encore jamais vus sont ajoutés
+        à la frontière, jusqu'à la profondeur et au budget de pages configurés
+        (SCRAPING_CONFIG['crawl_max_depth'], SCRAPING_CONFIG['crawl_budget']).
+        Les pages de détail visitées sont mémorisées d'un run à l'autre
+        (known_urls, par défaut OUTPUT_FILES['known_urls']): un lien vers une
+        annonce jamais visitée passe en priorité. Une carte de listing dont le
+        lien a déjà été vu sur une autre carte est retirée des propriétés.
+        """
+        frontier = CrawlFrontier(max_depth=max_depth, budget=budget)
+        known = SeenSet(known_urls or OUTPUT_FILES['known_urls'])
+        unique = []
+        for property_data in self.properties:
+            url = property_data.get('lien', 'N/A')
+            if url == 'N/A' or frontier.push(url, property_data, depth=0):
+                unique.append(property_data)
+        if len(unique) < len(self.properties):
+            logger.info(f"{len(self.properties) - len(unique)} cartes en double (même lien) ignorées")
+            self.properties[:] = unique
+        
+        discovered = 0
+        try:
+            while True:
+                if self.run_budget_exhausted():
+                    logger.warning(f"Budget de temps du run épuisé: {len(frontier)} pages de détail non visitées")
+                    break
+                item = frontier.pop()
+                if item is None:
+                    break
+                url, property_data, depth = item
+                logger.info(f"Détails {frontier.popped} (profondeur {depth}, {len(frontier)} en attente): "
+                            f"{property_data.get('titre', 'N/A')}")
                 
-                # Fusionner les détails avec les données existantes
+                # Récupérer les détails complets et les fusionner avec les données existantes
+                detailed_info = self.get_detailed_property_info(url)
                 property_data.update(detailed_info)
+                if detailed_info:
+                    known.add(url)
+                if depth > 0:
+                    self.properties.append(self.fill_from_details(property_data))
+                    discovered += 1
+                
+                # Suivre les propriétés similaires encore jamais vues
+                recent = is_recent(detailed_info.get('derniere_mise_a_jour'))
+                for link in detailed_info.get('proprietes_similaires', []):
+                    priority = link_priority(depth + 1, link, recent, new=link['lien'] not in known)
+                    frontier.push(link['lien'], {'titre': link['titre'], 'lien': link['lien'], 'decouverte_via': url},
+                                  depth=depth + 1, priority=priority)
                 
                 # Pause entre les requêtes détaillées
                 time.sleep(2)
-            
-            logger.info("Récupération des détails terminée")
+        finally:
+            frontier.close()
+            known.close()
         
-        logger.info(f"Scraping complet terminé. Total: {len(self.properties)} propriétés avec détails")
+        if discovered:
+            logger.info(f"{discovered} propriétés découvertes via les propriétés similaires")
     
     def save_to_json(self, filename='keur_immo_terrains.json'):
         """Sauvegarde les données en JSON"""
@@ -429,13 +655,23 @@ class KeurImmoScraper:
             logger.warning("Aucune donnée à sauvegarder")
             return
         
-        fieldnames = self.properties[0].keys()
+        # Les propriétés n'ont pas toutes les mêmes champs (détails, propriétés découvertes)
+        fieldnames = list(dict.fromkeys(key for prop in self.properties for key in prop))
         with open(filename, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             writer.writerows(self.properties)
         logger.info(f"Données sauvegardées dans {filename}")
     
+    def save_to_excel(self, filename=None):
+        """Sauvegarde les données en Excel (colonnes de config.FIELDS_ORDER, fichier OUTPUT_FILES['excel'])"""
+        if not self.properties:
+            logger.warning("Aucune donnée à sauvegarder")
+            return
+        
+        from excel_export import export_to_excel
+        export_to_excel(self.properties, filename or OUTPUT_FILES['excel'])
+    
     def analyze_data(self):
         """Analyse les données récupérées et affiche des statistiques"""
         if not self.properties:
@@ -531,24 +767,80 @@ def main():
                        help='Ne pas récupérer les détails complets (plus rapide)')
     parser.add_argument('--max-properties', type=int, default=None,
                        help='Nombre maximum de propriétés à scraper')
+    parser.add_argument('--download-images', action='store_true',
+                       help="Télécharger les images dans un stockage local dédupliqué (aussi: SCRAPING_CONFIG['download_images'])")
+    parser.add_argument('--images-dir', default=None,
+                       help='Répertoire du stockage des images (défaut: images/)')
+    parser.add_argument('--page-budget', type=float, default=None,
+                       help='Temps maximum (s) par page, retries compris')
+    parser.add_argument('--run-budget', type=float, default=None,
+                       help='Temps maximum (s) pour tout le run')
+    parser.add_argument('--crawl-depth', type=int, default=None,
+                       help='Profondeur de suivi des propriétés similaires (0 = listings seulement)')
+    parser.add_argument('--crawl-budget', type=int, default=None,
+                       help='Nombre maximum de pages de détail visitées')
+    parser.add_argument('--no-hedge', action='store_true',
+                       help='Ne pas dupliquer les requêtes lentes')
+    parser.add_argument('--profile', nargs='?', const='profile', default=None, metavar='DIR',
+                       help='Profiler le run par étape (fichiers écrits dans DIR, défaut: profile/)')
+    parser.add_argument('--profile-memory', action='store_true',
+                       help='Avec --profile: passe mémoire (tracemalloc) au lieu de la passe CPU')
     
     args = parser.parse_args()
     
-    scraper = KeurImmoScraper()
+    scraper = KeurImmoScraper(page_time_budget=args.page_budget, run_time_budget=args.run_budget,
+                              hedge_requests=False if args.no_hedge else None)
+    
+    profiler = None
+    if args.profile:
+        from profiling import Profiler
+        profiler = Profiler(args.profile, memory=args.profile_memory).start()
+        instrument(scraper, profiler)
     
+    try:
+        run(scraper, args)
+    finally:
+        if profiler:
+            profiler.stop()
+            files = 'memory.txt' if args.profile_memory else 'stacks.folded, *.prof'
+            print(f"🔬 Profil écrit dans {args.profile}/ ({files}, summary.txt)")
+
+def instrument(scraper, profiler):
+    """Rattache les méthodes du scraper aux étapes du profilage (--profile)"""
+    profiler.wrap(scraper, 'get_page', 'fetch')
+    profiler.wrap(scraper, 'parse_html', 'parse')
+    profiler.wrap(scraper, 'parse_property_listing', 'parse', memory_snapshot=True)
+    profiler.wrap(scraper, 'extract_property_data', 'extract')
+    profiler.wrap(scraper, 'get_detailed_property_info', 'extract')
+    profiler.wrap(scraper, 'save_to_json', 'write')
+    profiler.wrap(scraper, 'save_to_csv', 'write')
+    profiler.wrap(scraper, 'save_to_excel', 'write')
+
+def run(scraper, args):
+    """Scraping, sauvegarde et analyse selon les options de la ligne de commande"""
     # Scraper avec ou sans détails complets
     get_details = not args.no_details
-    scraper.scrape_all_pages(get_details=get_details)
+    scraper.scrape_all_pages(get_details=get_details, crawl_depth=args.crawl_depth,
+                             crawl_budget=args.crawl_budget)
     
     # Limiter le nombre de propriétés si spécifié
     if args.max_properties and len(scraper.properties) > args.max_properties:
         scraper.properties = scraper.properties[:args.max_properties]
         logger.info(f"Limitation à {args.max_properties} propriétés")
     
+    if scraper.properties and (args.download_images or SCRAPING_CONFIG['download_images']):
+        from image_pipeline import ImageStore, IMAGES_DIR
+        ImageStore(args.images_dir or IMAGES_DIR).attach_to_properties(scraper.properties)
+    
     if scraper.properties:
         # Sauvegarder les données
         scraper.save_to_json()
         scraper.save_to_csv()
+        scraper.save_to_excel()
+        
+        # Mettre à jour les agrégats de marché persistants (voir market_stats.py)
+        from market_stats import update_market_stats, STATS_DB
+        update_market_stats(scraper.properties, run_id=datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S"))
         
         # Analyser les données
         scraper.analyze_data()
@@ -570,6 +862,8 @@ def main():
         print(f"\n=== FICHIERS GÉNÉRÉS ===")
         print(f"📄 keur_immo_terrains.json - Données complètes en JSON")
         print(f"📊 keur_immo_terrains.csv - Données tabulaires en CSV")
+        print(f"📗 {OUTPUT_FILES['excel']} - Données tabulaires en Excel")
+        print(f"📉 {STATS_DB} - Agrégats de marché cumulés (python market_stats.py)")
         print(f"📈 Total: {len(scraper.properties)} propriétés avec tous les détails")
         
     else:
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Statistiques de marché maintenues de façon incrémentale
+
+À la fin de chaque run, les annonces sont agrégées par (date, catégorie,
+localisation) puis fusionnées dans des tables SQLite persistantes:
+compteurs, sommes, min/max, t-digest des prix (quantiles approchés) et
+nombre d'annonces par caractéristique. La mise à jour coûte O(annonces du
+run) et les tableaux de bord lisent directement ces agrégats au lieu de
+relire tous les anciens exports.
+
+Une annonce (clé change_capture.listing_key) n'est comptée qu'une fois par
+jour: si plusieurs runs ont lieu le même jour, seules les annonces pas encore
+vues ce jour-là sont ajoutées. Dans les agrégats, `nombre` est donc le nombre
+d'annonces distinctes observées ce jour-là. La table `annonces` garde, par
+annonce, sa dernière catégorie, localisation et caractéristiques ainsi que
+ses premier et dernier jours d'observation: les classements sur une période
+(top_locations, top_features) comptent des annonces distinctes, et non la
+somme des comptes journaliers.
+
+Usage:
+    python market_stats.py --since 2025-12-01 --categorie Terrain
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+from collections import Counter
+from datetime import datetime, timezone
+
+from change_capture import listing_key
+from config import OUTPUT_FILES
+
+STATS_DB = os.environ.get("STATS_DB", OUTPUT_FILES['stats'])
+UNKNOWN = 'inconnue'
+
+
+class TDigest:
+    """
+    t-digest (variante "merging") pour estimer les quantiles en mémoire bornée
+
+    Les centroïdes [moyenne, poids] sont d'autant plus fins qu'ils sont proches
+    des extrémités de la distribution; deux digests se fusionnent sans perte
+    notable, ce qui permet de combiner des jours ou des localisations.
+    """
+
+    def __init__(self, compression=100, centroids=None):
+        self.compression = compression
+        self.centroids = [list(c) for c in centroids or []]
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        self._buffer.append([float(value), weight])
+        if len(self._buffer) > self.compression * 5:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self._buffer.extend(list(c) for c in other.centroids)
+        self._compress()
+        return self
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        merged = []
+        cumulative = 0
+        mean, weight = points[0]
+        for next_mean, next_weight in points[1:]:
+            q = (cumulative + weight + next_weight / 2) / total
+            # Poids maximal d'un centroïde selon sa position dans la distribution
+            if weight + next_weight <= max(1, 4 * total * q * (1 - q) / self.compression):
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append([mean, weight])
+                cumulative += weight
+                mean, weight = next_mean, next_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def count(self):
+        self._compress()
+        return sum(weight for _, weight in self.centroids)
+
+    def quantile(self, q):
+        """Valeur approchée du quantile q (0-1), None si le digest est vide"""
+        self._compress()
+        if not self.centroids:
+            return None
+        total = self.count()
+        target = q * total
+        cumulative = 0
+        previous = None
+        for mean, weight in self.centroids:
+            midpoint = cumulative + weight / 2
+            if target <= midpoint:
+                if previous is None:
+                    return mean
+                prev_mean, prev_midpoint = previous
+                ratio = (target - prev_midpoint) / (midpoint - prev_midpoint)
+                return prev_mean + (mean - prev_mean) * ratio
+            previous = (mean, midpoint)
+            cumulative += weight
+        return self.centroids[-1][0]
+
+    def to_json(self):
+        self._compress()
+        return json.dumps([[round(mean, 2), weight] for mean, weight in self.centroids])
+
+    @classmethod
+    def from_json(cls, data, compression=100):
+        return cls(compression, json.loads(data) if data else [])
+
+
+def parse_price(prix):
+    """Prix en nombre entier (mêmes règles que KeurImmoScraper.analyze_data)"""
+    if not prix or prix == 'N/A':
+        return None
+    numbers = re.findall(r'[\d\s]+', str(prix).replace(',', '').replace('.', ''))
+    numbers = [n for n in numbers if n.strip()]
+    if not numbers:
+        return None
+    try:
+        return int(''.join(numbers[0].split()))
+    except ValueError:
+        return None
+
+
+def parse_surface(surface):
+    if not surface or surface == 'N/A':
+        return None
+    numbers = re.findall(r'\d+', str(surface))
+    return int(numbers[0]) if numbers else None
+
+
+class MarketStats:
+    """Tables d'agrégats par (date, catégorie, localisation) dans SQLite"""
+
+    def __init__(self, path=STATS_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS agregats (
+                date TEXT NOT NULL,
+                categorie TEXT NOT NULL,
+                localisation TEXT NOT NULL,
+                nombre INTEGER NOT NULL DEFAULT 0,
+                nombre_prix INTEGER NOT NULL DEFAULT 0,
+                somme_prix REAL NOT NULL DEFAULT 0,
+                min_prix REAL,
+                max_prix REAL,
+                digest_prix TEXT,
+                nombre_surface INTEGER NOT NULL DEFAULT 0,
+                somme_surface REAL NOT NULL DEFAULT 0,
+                min_surface REAL,
+                max_surface REAL,
+                PRIMARY KEY (date, categorie, localisation)
+            );
+            CREATE TABLE IF NOT EXISTS caracteristiques (
+                date TEXT NOT NULL,
+                categorie TEXT NOT NULL,
+                localisation TEXT NOT NULL,
+                caracteristique TEXT NOT NULL,
+                nombre INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, categorie, localisation, caracteristique)
+            );
+            CREATE TABLE IF NOT EXISTS annonces (
+                cle TEXT PRIMARY KEY,
+                categorie TEXT NOT NULL,
+                localisation TEXT NOT NULL,
+                caracteristiques TEXT NOT NULL DEFAULT '[]',
+                premiere_vue TEXT NOT NULL,
+                derniere_vue TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS annonces_derniere_vue ON annonces (derniere_vue);
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                annonces INTEGER NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def _group_key(prop, categorie):
+        location = (prop.get('localisation') or '').strip()
+        return (
+            categorie or prop.get('type') or prop.get('type_bien') or UNKNOWN,
+            UNKNOWN if location in ('', 'N/A') else location,
+        )
+
+    def _new_for_day(self, properties, date, categorie):
+        """
+        Annonces pas encore comptées le jour `date`, une seule fois chacune
+
+        Met à jour la table `annonces` (dernière catégorie/localisation,
+        premier et dernier jour vus) pour toutes les annonces du run.
+        """
+        fresh = {}
+        for prop in properties:
+            key = listing_key(prop)
+            if key in fresh:
+                continue
+            row = self.conn.execute("SELECT derniere_vue FROM annonces WHERE cle = ?", (key,)).fetchone()
+            if row and row[0] == date:
+                continue
+            fresh[key] = prop
+
+        self.conn.executemany("""
+            INSERT INTO annonces (cle, categorie, localisation, caracteristiques, premiere_vue, derniere_vue)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (cle) DO UPDATE SET
+                categorie = excluded.categorie,
+                localisation = excluded.localisation,
+                caracteristiques = excluded.caracteristiques,
+                premiere_vue = MIN(premiere_vue, excluded.premiere_vue),
+                derniere_vue = MAX(derniere_vue, excluded.derniere_vue)
+        """, [(key, *self._group_key(prop, categorie),
+               json.dumps(sorted(set(prop.get('caracteristiques') or [])), ensure_ascii=False), date, date)
+              for key, prop in fresh.items()])
+        return list(fresh.values())
+
+    def _group(self, properties, categorie):
+        """Agrège en mémoire les annonces, par clé de groupe"""
+        groups = {}
+        for prop in properties:
+            key = self._group_key(prop, categorie)
+            group = groups.setdefault(key, {'nombre': 0, 'prix': [], 'surfaces': [], 'caracteristiques': Counter()})
+            group['nombre'] += 1
+            price = parse_price(prop.get('prix'))
+            if price is not None:
+                group['prix'].append(price)
+            surface = parse_surface(prop.get('surface'))
+            if surface is not None:
+                group['surfaces'].append(surface)
+            group['caracteristiques'].update(set(prop.get('caracteristiques') or []))
+        return groups
+
+    def update(self, properties, run_id, date=None, categorie=None):
+        """
+        Fusionne les annonces d'un run dans les agrégats
+
+        Les annonces déjà comptées le même jour (run précédent) sont ignorées.
+
+        Args:
+            properties (list): annonces du run
+            run_id (str): identifiant du run; un run déjà appliqué est ignoré
+            date (str, optional): jour des agrégats (AAAA-MM-JJ). Par défaut: aujourd'hui (UTC)
+            categorie (str, optional): catégorie imposée, sinon le champ type/type_bien
+
+        Returns:
+            bool: False si le run avait déjà été appliqué
+        """
+        date = date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self.conn:
+            inserted = self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, date, annonces) VALUES (?, ?, ?)",
+                (run_id, date, len(properties))
+            ).rowcount
+            if not inserted:
+                return False
+
+            fresh = self._new_for_day(properties, date, categorie)
+            for (cat, loc), group in self._group(fresh, categorie).items():
+                row = self.conn.execute(
+                    "SELECT digest_prix FROM agregats WHERE date = ? AND categorie = ? AND localisation = ?",
+                    (date, cat, loc)
+                ).fetchone()
+                digest = TDigest.from_json(row[0] if row else None)
+                for price in group['prix']:
+                    digest.add(price)
+
+                prices, surfaces = group['prix'], group['surfaces']
+                self.conn.execute("""
+                    INSERT INTO agregats (date, categorie, localisation, nombre,
+                        nombre_prix, somme_prix, min_prix, max_prix, digest_prix,
+                        nombre_surface, somme_surface, min_surface, max_surface)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (date, categorie, localisation) DO UPDATE SET
+                        nombre = nombre + excluded.nombre,
+                        nombre_prix = nombre_prix + excluded.nombre_prix,
+                        somme_prix = somme_prix + excluded.somme_prix,
+                        min_prix = MIN(COALESCE(min_prix, excluded.min_prix), COALESCE(excluded.min_prix, min_prix)),
+                        max_prix = MAX(COALESCE(max_prix, excluded.max_prix), COALESCE(excluded.max_prix, max_prix)),
+                        digest_prix = excluded.digest_prix,
+                        nombre_surface = nombre_surface + excluded.nombre_surface,
+                        somme_surface = somme_surface + excluded.somme_surface,
+                        min_surface = MIN(COALESCE(min_surface, excluded.min_surface), COALESCE(excluded.min_surface, min_surface)),
+                        max_surface = MAX(COALESCE(max_surface, excluded.max_surface), COALESCE(excluded.max_surface, max_surface))
+                """, (
+                    date, cat, loc, group['nombre'],
+                    len(prices), sum(prices), min(prices, default=None), max(prices, default=None),
+                    digest.to_json(),
+                    len(surfaces), sum(surfaces), min(surfaces, default=None), max(surfaces, default=None),
+                ))
+
+                self.conn.executemany("""
+                    INSERT INTO caracteristiques (date, categorie, localisation, caracteristique, nombre)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (date, categorie, localisation, caracteristique) DO UPDATE SET
+                        nombre = nombre + excluded.nombre
+                """, [(date, cat, loc, feature, count) for feature, count in group['caracteristiques'].items()])
+        return True
+
+    def _where(self, since=None, until=None, categorie=None, localisation=None):
+        clauses, params = [], []
+        for clause, value in (("date >= ?", since), ("date <= ?", until),
+                              ("categorie = ?", categorie), ("localisation = ?", localisation)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(self, since=None, until=None, categorie=None, localisation=None, quantiles=(0.5, 0.9)):
+        """Statistiques par jour, lues dans les agrégats (digests fusionnés par jour)"""
+        where, params = self._where(since, until, categorie, localisation)
+        days = {}
+        for row in self.conn.execute(
+                "SELECT date, nombre, nombre_prix, somme_prix, min_prix, max_prix, digest_prix, "
+                "nombre_surface, somme_surface FROM agregats" + where + " ORDER BY date", params):
+            day = days.setdefault(row[0], {
+                'nombre': 0, 'nombre_prix': 0, 'somme_prix': 0, 'min_prix': None, 'max_prix': None,
+                'nombre_surface': 0, 'somme_surface': 0, 'digest': TDigest(),
+            })
+            day['nombre'] += row[1]
+            day['nombre_prix'] += row[2]
+            day['somme_prix'] += row[3]
+            if row[4] is not None:
+                day['min_prix'] = row[4] if day['min_prix'] is None else min(day['min_prix'], row[4])
+                day['max_prix'] = row[5] if day['max_prix'] is None else max(day['max_prix'], row[5])
+            day['digest'].merge(TDigest.from_json(row[6]))
+            day['nombre_surface'] += row[7]
+            day['somme_surface'] += row[8]
+
+        result = []
+        for date, day in days.items():
+            digest = day.pop('digest')
+            day['date'] = date
+            day['prix_moyen'] = day['somme_prix'] / day['nombre_prix'] if day['nombre_prix'] else None
+            day['surface_moyenne'] = day['somme_surface'] / day['nombre_surface'] if day['nombre_surface'] else None
+            for q in quantiles:
+                day[f"prix_p{int(q * 100)}"] = digest.quantile(q)
+            result.append(day)
+        return result
+
+    def _where_listings(self, since=None, until=None, categorie=None, localisation=None):
+        """Filtre sur `annonces`: annonces observées au moins une fois sur la période"""
+        clauses, params = [], []
+        for clause, value in (("derniere_vue >= ?", since), ("premiere_vue <= ?", until),
+                              ("categorie = ?", categorie), ("localisation = ?", localisation)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def top_locations(self, limit=10, **filters):
+        """Localisations par nombre d'annonces distinctes sur la période"""
+        where, params = self._where_listings(**filters)
+        return self.conn.execute(
+            "SELECT localisation, COUNT(*) AS total FROM annonces" + where +
+            " GROUP BY localisation ORDER BY total DESC LIMIT ?", params + [limit]
+        ).fetchall()
+
+    def top_features(self, limit=5, **filters):
+        """Caractéristiques par nombre d'annonces distinctes sur la période"""
+        where, params = self._where_listings(**filters)
+        return self.conn.execute(
+            "SELECT feature.value AS caracteristique, COUNT(*) AS total "
+            "FROM annonces, json_each(annonces.caracteristiques) AS feature" + where +
+            " GROUP BY caracteristique ORDER BY total DESC LIMIT ?", params + [limit]
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def update_market_stats(properties, run_id, path=STATS_DB, **kwargs):
+    """Met à jour les agrégats avec les annonces d'un run terminé"""
+    stats = MarketStats(path)
+    try:
+        return stats.update(properties, run_id, **kwargs)
+    finally:
+        stats.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Statistiques de marché pré-calculées')
+    parser.add_argument('--db', default=STATS_DB, help='Base SQLite des agrégats')
+    parser.add_argument('--since', default=None, help='Date de début (AAAA-MM-JJ)')
+    parser.add_argument('--until', default=None, help='Date de fin (AAAA-MM-JJ)')
+    parser.add_argument('--categorie', default=None)
+    parser.add_argument('--localisation', default=None)
+    args = parser.parse_args()
+
+    filters = {'since': args.since, 'until': args.until,
+               'categorie': args.categorie, 'localisation': args.localisation}
+    stats = MarketStats(args.db)
+    try:
+        print("=== STATISTIQUES PAR JOUR ===")
+        for day in stats.summary(**filters):
+            prix = ' '.join(f"{key}={day[key]:,.0f}" for key in ('prix_moyen', 'prix_p50', 'prix_p90')
+                            if day[key] is not None)
+            print(f"{day['date']}: {day['nombre']} annonces {prix}")
+
+        print("\n--- Top 10 des localisations ---")
+        for loc, count in stats.top_locations(**filters):
+            print(f"{loc}: {count} propriétés")
+
+        print("\n--- Caractéristiques les plus communes ---")
+        for feature, count in stats.top_features(**filters):
+            print(f"{feature}: {count} propriétés")
+    finally:
+        stats.close()
+
+
+if __name__ == "__main__":
+    main()
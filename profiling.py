@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Mode profilage des scrapers (--profile)
+
+Les fonctions instrumentées sont rattachées à une étape (fetch, parse,
+extract, write, upload). Deux passes séparées, car tracemalloc ralentit
+fortement chaque allocation et fausserait les temps:
+
+- passe CPU (par défaut): un profil cProfile distinct par étape; en parallèle
+  un échantillonneur relève la pile du thread principal et produit un fichier
+  au format "folded" (flamegraph.pl, speedscope) dont la racine est le nom de
+  l'étape;
+- passe mémoire (memory=True, --profile-memory): tracemalloc seul, avec un
+  instantané après chaque page de listing.
+
+Fichiers produits dans le répertoire de sortie:
+    <etape>.prof     profil cProfile (pstats, snakeviz)          passe CPU
+    stacks.folded    piles échantillonnées pour flame graph      passe CPU
+    memory.txt       évolution mémoire par page de listing       passe mémoire
+    summary.txt      temps par étape (et fonctions les plus coûteuses)
+"""
+
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = "profile"
+
+
+class Profiler:
+    def __init__(self, output_dir=PROFILE_DIR, interval=0.005, memory_top=10, memory=False):
+        self.output_dir = output_dir
+        self.memory = memory
+        self.interval = interval
+        self.memory_top = memory_top
+        self.profiles = {}
+        self.stage_times = defaultdict(float)
+        self.stage_calls = Counter()
+        self.stacks = Counter()
+        self.memory_reports = []
+        self._stages = []  # pile des étapes en cours (les étapes s'imbriquent)
+        self._stage_started = None
+        self._previous_snapshot = None
+        self._sampler = None
+        self._running = False
+        self._thread_id = None
+
+    def _switch(self, old, new):
+        """Arrête le profil/chronomètre de l'étape `old` et démarre celui de `new`"""
+        now = time.perf_counter()
+        if old is not None:
+            if not self.memory:
+                self.profiles[old].disable()
+            self.stage_times[old] += now - self._stage_started
+        if new is not None and not self.memory:
+            self.profiles.setdefault(new, cProfile.Profile()).enable()
+        self._stage_started = now
+
+    @contextmanager
+    def stage(self, name):
+        """Contexte d'exécution d'une étape; le temps est exclusif des sous-étapes"""
+        outer = self._stages[-1] if self._stages else None
+        self._switch(outer, name)
+        self._stages.append(name)
+        self.stage_calls[name] += 1
+        try:
+            yield
+        finally:
+            self._stages.pop()
+            self._switch(name, outer)
+
+    def wrap(self, owner, attribute, stage, memory_snapshot=False):
+        """Remplace `owner.attribute` par une version exécutée dans l'étape `stage`"""
+        func = getattr(owner, attribute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage):
+                result = func(*args, **kwargs)
+            if memory_snapshot:
+                self.snapshot_memory(f"{attribute} #{self.stage_calls[stage]}")
+            return result
+
+        setattr(owner, attribute, wrapper)
+        return wrapper
+
+    def snapshot_memory(self, label):
+        """Instantané tracemalloc, comparé au précédent (passe mémoire seulement)"""
+        if not self.memory:
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"=== {label}: courant {current / 1024:.1f} Kio, pic {peak / 1024:.1f} Kio"]
+        if self._previous_snapshot is not None:
+            for stat in snapshot.compare_to(self._previous_snapshot, 'lineno')[:self.memory_top]:
+                lines.append(f"  {stat}")
+        self.memory_reports.append('\n'.join(lines))
+        self._previous_snapshot = snapshot
+
+    def _sample(self):
+        cwd = os.getcwd()
+        while self._running:
+            frame = sys._current_frames().get(self._thread_id)
+            stage = self._stages[-1] if self._stages else None
+            if frame is not None and stage is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename == __file__:  # enveloppes d'instrumentation
+                        frame = frame.f_back
+                        continue
+                    filename = os.path.relpath(code.co_filename, cwd) \
+                        if code.co_filename.startswith(cwd) else os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(stage)
+                self.stacks[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+            self.snapshot_memory("début")
+        else:
+            self._thread_id = threading.get_ident()
+            self._running = True
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        """Arrête le profilage et écrit les fichiers de sortie"""
+        if self.memory:
+            self.snapshot_memory("fin")
+            tracemalloc.stop()
+        else:
+            self._running = False
+            self._sampler.join()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary = ["=== Temps par étape (exclusif) ==="]
+        if self.memory:
+            summary[0] += " -- passe mémoire: temps gonflés par tracemalloc"
+        for stage, seconds in sorted(self.stage_times.items(), key=lambda x: x[1], reverse=True):
+            summary.append(f"{stage}: {seconds:.3f}s sur {self.stage_calls[stage]} appels")
+
+        for stage, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.output_dir, f"{stage}.prof"))
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(15)
+            summary.append(f"\n=== {stage} ===\n{stream.getvalue().strip()}")
+
+        if self.memory:
+            with open(os.path.join(self.output_dir, 'memory.txt'), 'w', encoding='utf-8') as f:
+                f.write('\n\n'.join(self.memory_reports) + '\n')
+        else:
+            with open(os.path.join(self.output_dir, 'stacks.folded'), 'w', encoding='utf-8') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.output_dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(summary) + '\n')
+
+        logger.info(f"Profil écrit dans {self.output_dir}/ ({', '.join(summary[1:len(self.stage_times) + 1])})")
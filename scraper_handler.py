@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée serverless / cron pour scraper_local
+
+Expose un handler de type Lambda `handler(event, context)` et une CLI. Les
+imports coûteux (bs4, boto3) sont différés jusqu'à leur premier usage, et la
+session HTTP ainsi que le client S3 sont conservés entre les invocations d'un
+même conteneur. Chaque invocation retourne ses temps d'exécution.
+
+Usage:
+    python scraper_handler.py --no-upload
+    python scraper_handler.py --repeat 3   # une invocation froide puis des chaudes
+"""
+
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+
+import scraper_local  # noqa: E402
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+_cold_start = True
+
+
+def handler(event=None, context=None):
+    """
+    Exécute un scraping complet (fetch, parse, puis scraper_local.finish_run:
+    fichiers, agrégats de marché si STATS_DB, upload S3 optionnel)
+
+    Args:
+        event (dict, optional): clés reconnues `site_url`, `upload` (bool) et
+            `mode` ("full" ou "delta", voir scraper_local.OUTPUT_MODE)
+        context: contexte Lambda, non utilisé
+
+    Returns:
+        dict: statut, nombre d'annonces, fichiers produits et temps mesurés
+    """
+    global _cold_start
+    event = event or {}
+    cold_start, _cold_start = _cold_start, False
+    site_url = event.get('site_url', scraper_local.SITE_URL)
+    upload = event.get('upload', scraper_local.S3_UPLOAD_ENABLED)
+    timings = {'import': round(IMPORT_SECONDS, 4)} if cold_start else {}
+
+    start = time.perf_counter()
+    html = scraper_local.fetch_page(site_url)
+    timings['first_request'] = round(time.perf_counter() - start, 4)
+
+    step = time.perf_counter()
+    data = scraper_local.parse_annonces(html)
+    timings['parse'] = round(time.perf_counter() - step, 4)
+
+    if not data:
+        return {'statusCode': 204, 'annonces': 0, 'cold_start': cold_start, 'timings': timings}
+
+    local_paths, uploaded = scraper_local.finish_run(data, event.get('mode'), upload, timings)
+
+    timings['total'] = round(time.perf_counter() - start, 4)
+    return {
+        'statusCode': 200,
+        'annonces': len(data),
+        'fichiers': local_paths,
+        's3_uploaded': uploaded,
+        'cold_start': cold_start,
+        'timings': timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Point d\'entrée serverless pour scraper_local')
+    parser.add_argument('--url', default=scraper_local.SITE_URL, help='URL à scraper')
+    parser.add_argument('--no-upload', action='store_true', help='Ne pas téléverser vers S3')
+    parser.add_argument('--mode', choices=['full', 'delta'], default=scraper_local.OUTPUT_MODE,
+                        help='Snapshot complet ou seulement les changements')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Nombre d\'invocations successives (la première est à froid)')
+    args = parser.parse_args()
+
+    event = {'site_url': args.url, 'mode': args.mode}
+    if args.no_upload:
+        event['upload'] = False
+    for _ in range(args.repeat):
+        print(json.dumps(handler(event), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,61 @@
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timezone
 import os
 import re
+import sys
 import csv
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+import time
+
+import change_capture
+
+# bs4 et boto3 sont importés à la demande: leur import coûte cher au démarrage
+# à froid et boto3 est inutile quand l'upload S3 est désactivé.
 
 SITE_URL = os.environ.get("SITE_URL", "https://immobilier-au-senegal.com/list-layout/")
 # Configuration S3
 S3_BUCKET = os.environ.get("S3_BUCKET", "m2dsia-mouhamed-diouf")  # Votre bucket par défaut
 S3_KEY_PREFIX = os.environ.get("S3_KEY_PREFIX", "scraping/")
+S3_UPLOAD_ENABLED = os.environ.get("S3_UPLOAD", "1").lower() not in ("0", "false", "no")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Répertoire des fichiers générés (ex: /tmp en environnement serverless)
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", BASE_DIR)
+# "full": snapshot complet à chaque run; "delta": seulement les changements
+OUTPUT_MODE = os.environ.get("OUTPUT_MODE", "full")
+# Base des agrégats de marché mis à jour à chaque run (désactivé si vide)
+STATS_DB = os.environ.get("STATS_DB")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Réutilisés entre les invocations d'un même processus (conteneur "chaud")
+_session = None
+_s3_client = None
+
+
+def get_session():
+    """Session HTTP partagée: garde la connexion TLS ouverte entre les requêtes"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update(HEADERS)
+    return _session
+
+
+def get_s3_client():
+    """Client S3 partagé, construit (et boto3 importé) au premier upload"""
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        _s3_client = boto3.client('s3')
+    return _s3_client
 
 
 def save_to_local_csv(data, filename):
-    filepath = os.path.join(BASE_DIR, filename)
+    filepath = os.path.join(OUTPUT_DIR, filename)
 
     # Champs du CSV
-    fieldnames = ['titre', 'prix', 'localisation', 'type_bien', 'nombre_chambres', 'surface']
+    fieldnames = ['titre', 'prix', 'localisation', 'type_bien', 'nombre_chambres', 'surface', 'lien']
 
     with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -29,6 +66,13 @@ def save_to_local_csv(data, filename):
     return filepath
 
 
+def s3_key(object_name):
+    # S'assurer que le préfixe se termine par un /
+    if S3_KEY_PREFIX and not S3_KEY_PREFIX.endswith('/'):
+        return f"{S3_KEY_PREFIX}/{object_name}"
+    return f"{S3_KEY_PREFIX}{object_name}"
+
+
 def upload_to_s3(file_path, bucket_name=None, object_name=None):
     """
     Téléverse un fichier vers un bucket S3
@@ -46,15 +90,14 @@ def upload_to_s3(file_path, bucket_name=None, object_name=None):
             bucket_name = S3_BUCKET
             
         if object_name is None:
-            object_name = os.path.basename(file_path)
+            # Les sous-répertoires de OUTPUT_DIR sont conservés (ex: historique_prix/)
+            object_name = os.path.relpath(file_path, OUTPUT_DIR) \
+                if os.path.abspath(file_path).startswith(os.path.abspath(OUTPUT_DIR) + os.sep) \
+                else os.path.basename(file_path)
             
-        # S'assurer que le préfixe se termine par un /
-        if S3_KEY_PREFIX and not S3_KEY_PREFIX.endswith('/'):
-            full_key = f"{S3_KEY_PREFIX}/{object_name}"
-        else:
-            full_key = f"{S3_KEY_PREFIX}{object_name}"
+        full_key = s3_key(object_name)
             
-        s3 = boto3.client('s3')
+        s3 = get_s3_client()
         s3.upload_file(file_path, bucket_name, full_key)
         print(f"Fichier uploadé avec succès vers: s3://{bucket_name}/{full_key}")
         return True
@@ -64,90 +107,231 @@ def upload_to_s3(file_path, bucket_name=None, object_name=None):
         return False
 
 
-def scrape_site(url: str):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    response = requests.get(url, timeout=15, headers=headers)
+def download_from_s3(object_name, file_path, bucket_name=None):
+    """
+    Télécharge un objet S3 (sous S3_KEY_PREFIX) vers un fichier local
+
+    Returns:
+        bool: True si l'objet a été téléchargé, False s'il n'existe pas
+
+    Raises:
+        Exception: toute autre erreur S3 (réseau, droits...), pour ne pas la
+        confondre avec un objet absent
+    """
+    try:
+        get_s3_client().download_file(bucket_name or S3_BUCKET, s3_key(object_name), file_path)
+        return True
+    except Exception as e:
+        code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+        if code in ('404', 'NoSuchKey', 'NotFound'):
+            print(f"Objet S3 {object_name} absent")
+            return False
+        raise
+
+
+def save_changes(data, timestamp, upload=None):
+    """
+    Compare le run à l'état précédent et écrit le delta et l'historique des prix
+
+    Avec upload, l'état est récupéré depuis S3 s'il n'existe pas en local
+    (conteneur éphémère). Seul un état absent de S3 est traité comme un
+    premier run; toute autre erreur S3 interrompt le run, sans quoi toutes les
+    annonces apparaîtraient comme ajoutées et l'état serait écrasé. L'historique des prix est écrit dans un fichier
+    par run (historique_prix/<timestamp>.csv).
+
+    Returns:
+        list: fichiers locaux à téléverser
+    """
+    upload = S3_UPLOAD_ENABLED if upload is None else upload
+    state_path = os.path.join(OUTPUT_DIR, change_capture.STATE_FILE)
+    if upload and not os.path.exists(state_path):
+        download_from_s3(change_capture.STATE_FILE, state_path)
+
+    delta = change_capture.diff_listings(change_capture.load_state(state_path), data)
+    print(f"Changements détectés : {change_capture.summarize(delta)}")
+
+    delta_path = change_capture.save_delta_csv(
+        delta, os.path.join(OUTPUT_DIR, f"annonces_delta_{timestamp}.csv"))
+    history_path = change_capture.save_price_history(
+        delta, os.path.join(OUTPUT_DIR, change_capture.PRICE_HISTORY_DIR), timestamp)
+    change_capture.save_state(data, state_path)
+    print(f"Fichier delta sauvegardé localement : {delta_path}")
+    return [delta_path, history_path, state_path]
+
+
+def save_outputs(data, timestamp, mode=None, upload=None):
+    """Écrit les fichiers du run selon OUTPUT_MODE et retourne ceux à téléverser"""
+    if (mode or OUTPUT_MODE) == "delta":
+        return save_changes(data, timestamp, upload)
+    return [save_to_local_csv(data, f"annonces_{timestamp}.csv")]
+
+
+def finish_run(data, mode=None, upload=None, timings=None):
+    """
+    Étapes communes de fin de run, pour run() comme pour scraper_handler:
+    fichiers de sortie, agrégats de marché (si STATS_DB) et upload S3
+
+    Args:
+        data (list): annonces du run
+        mode (str, optional): "full" ou "delta". Par défaut: OUTPUT_MODE
+        upload (bool, optional): téléverser vers S3. Par défaut: S3_UPLOAD_ENABLED
+        timings (dict, optional): reçoit les durées des étapes write, stats et upload
+
+    Returns:
+        tuple: (fichiers locaux, succès de l'upload ou None sans upload)
+    """
+    upload = S3_UPLOAD_ENABLED if upload is None else upload
+    timings = {} if timings is None else timings
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+    step = time.perf_counter()
+    local_paths = save_outputs(data, timestamp, mode, upload)
+    timings['write'] = round(time.perf_counter() - step, 4)
+
+    if STATS_DB:
+        from market_stats import update_market_stats
+        step = time.perf_counter()
+        update_market_stats(data, run_id=timestamp, path=STATS_DB)
+        timings['stats'] = round(time.perf_counter() - step, 4)
+
+    uploaded = None
+    if upload:
+        step = time.perf_counter()
+        uploaded = all([upload_to_s3(path) for path in local_paths])
+        timings['upload'] = round(time.perf_counter() - step, 4)
+    return local_paths, uploaded
+
+
+def fetch_page(url: str):
+    response = get_session().get(url, timeout=15)
     response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
+    return response.text
+
 
-    results = []
+def scrape_site(url: str):
+    return parse_annonces(fetch_page(url))
+
+
+def parse_annonces(html: str):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
 
     annonces = soup.select("article.rh_list_card")
-    for ann in annonces:
-        titre = ann.select_one("h3")
-        
-        # Prix - chercher dans tout l'article
-        prix = None
-        prix_elements = ann.find_all(string=lambda text: text and ('Fr' in text or 'FCFA' in text or 'CFA' in text or '€' in text))
-        if prix_elements:
-            prix = prix_elements[0].strip()
-        
-        # Localisation - extraire du titre
-        localisation = None
-        if titre:
-            titre_text = titre.get_text(strip=True)
-            if 'Sénégal' in titre_text:
-                localisation = titre_text
-        
-        # Type de bien
-        type_bien = None
-        if titre:
-            titre_text = titre.get_text(strip=True).lower()
-            if 'terrain' in titre_text:
-                type_bien = 'Terrain'
-            elif 'maison' in titre_text:
-                type_bien = 'Maison'
-            elif 'appartement' in titre_text:
-                type_bien = 'Appartement'
-            elif 'villa' in titre_text:
-                type_bien = 'Villa'
-        
-        # Surface - extraire du titre
-        surface = None
-        if titre:
-            titre_text = titre.get_text(strip=True)
-            surface_match = re.search(r'(\d+(?:\s*\d+)*)\s*(?:mètres|m²|m2)', titre_text)
-            if surface_match:
-                surface = surface_match.group(0)
-        
-        # Nombre de chambres (non applicable pour les terrains)
-        nb_chambres = None
-        if type_bien and type_bien != 'Terrain':
-            nb_chambres = ann.select_one(".chambres, .bedrooms")
-            if nb_chambres:
-                nb_chambres = nb_chambres.get_text(strip=True)
-
-        result = {
-            "titre": titre.get_text(strip=True) if titre else None,
-            "prix": prix,
-            "localisation": localisation,
-            "type_bien": type_bien,
-            "nombre_chambres": nb_chambres.get_text(strip=True) if nb_chambres else None,
-            "surface": surface,
-        }
-
-        results.append(result)
-
-    return results
+    return [extract_annonce(ann) for ann in annonces]
 
-if __name__ == "__main__":
+
+def extract_annonce(ann):
+    titre = ann.select_one("h3")
+    
+    # Prix - chercher dans tout l'article
+    prix = None
+    prix_elements = ann.find_all(string=lambda text: text and ('Fr' in text or 'FCFA' in text or 'CFA' in text or '€' in text))
+    if prix_elements:
+        prix = prix_elements[0].strip()
+    
+    # Localisation - extraire du titre
+    localisation = None
+    if titre:
+        titre_text = titre.get_text(strip=True)
+        if 'Sénégal' in titre_text:
+            localisation = titre_text
+    
+    # Type de bien
+    type_bien = None
+    if titre:
+        titre_text = titre.get_text(strip=True).lower()
+        if 'terrain' in titre_text:
+            type_bien = 'Terrain'
+        elif 'maison' in titre_text:
+            type_bien = 'Maison'
+        elif 'appartement' in titre_text:
+            type_bien = 'Appartement'
+        elif 'villa' in titre_text:
+            type_bien = 'Villa'
+    
+    # Surface - extraire du titre
+    surface = None
+    if titre:
+        titre_text = titre.get_text(strip=True)
+        surface_match = re.search(r'(\d+(?:\s*\d+)*)\s*(?:mètres|m²|m2)', titre_text)
+        if surface_match:
+            surface = surface_match.group(0)
+    
+    # Nombre de chambres (non applicable pour les terrains)
+    nb_chambres = None
+    if type_bien and type_bien != 'Terrain':
+        nb_chambres = ann.select_one(".chambres, .bedrooms")
+        if nb_chambres:
+            nb_chambres = nb_chambres.get_text(strip=True)
+
+    lien = ann.select_one("a[href]")
+
+    result = {
+        "titre": titre.get_text(strip=True) if titre else None,
+        "prix": prix,
+        "localisation": localisation,
+        "type_bien": type_bien,
+        "nombre_chambres": nb_chambres.get_text(strip=True) if nb_chambres else None,
+        "surface": surface,
+        "lien": lien['href'] if lien else None,
+    }
+
+    return result
+
+
+def instrument(profiler):
+    """Rattache les fonctions du module aux étapes du profilage (--profile)"""
+    module = sys.modules[__name__]
+    profiler.wrap(module, 'fetch_page', 'fetch')
+    profiler.wrap(module, 'parse_annonces', 'parse', memory_snapshot=True)
+    profiler.wrap(module, 'extract_annonce', 'extract')
+    profiler.wrap(module, 'save_outputs', 'write')
+    profiler.wrap(module, 'upload_to_s3', 'upload')
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f'Scraper pour {SITE_URL}')
+    parser.add_argument('--profile', nargs='?', const='profile', default=None, metavar='DIR',
+                        help='Profiler le run par étape (fichiers écrits dans DIR, défaut: profile/)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Avec --profile: passe mémoire (tracemalloc) au lieu de la passe CPU')
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        from profiling import Profiler
+        profiler = Profiler(args.profile, memory=args.profile_memory).start()
+        instrument(profiler)
+
+    try:
+        return run()
+    finally:
+        if profiler:
+            profiler.stop()
+            print(f"Profil écrit dans {args.profile}/")
+
+
+def run():
     print(f"Début du scraping sur {SITE_URL}")
     data = scrape_site(SITE_URL)
     print(f"{len(data)} annonces récupérées")
 
     if not data:
         print("Aucune donnée à sauvegarder. Arrêt du script.")
-        exit(1)
+        return 1
 
-    # Sauvegarder localement
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"annonces_{timestamp}.csv"
-    local_path = save_to_local_csv(data, csv_filename)
-
-    # Upload vers S3
-    if upload_to_s3(local_path):
+    _, uploaded = finish_run(data)
+    if uploaded is None:
+        print("Upload S3 désactivé (S3_UPLOAD=0)")
+    elif uploaded:
         print("Téléversement S3 réussi!")
     else:
         print("Échec du téléversement S3, vérifiez les logs pour plus de détails")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+File de travail durable pour répartir le scraping keur-immo.com sur plusieurs workers
+
+Les pages de listing et les pages de détail deviennent des tâches stockées dans
+une file (SQLite en local, ou Redis pour plusieurs conteneurs). Chaque worker
+prend une tâche en bail (lease) pour une durée limitée : si le worker meurt, la
+tâche redevient visible à l'expiration du bail. Les résultats sont écrits par
+identifiant de tâche, donc une tâche rejouée écrase son résultat sans doublon.
+
+Usage:
+    python work_queue.py seed --db queue.sqlite
+    python work_queue.py worker --db queue.sqlite --processes 4
+    python work_queue.py export --db queue.sqlite --output annonces.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+from config import SCRAPING_CONFIG
+from crawl_frontier import normalize_url
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = os.environ.get("QUEUE_DB", "keur_immo_queue.sqlite")
+QUEUE_URL = os.environ.get("QUEUE_URL")  # ex: redis://localhost:6379/0
+DEFAULT_TARGET_URL = "https://keur-immo.com/senegal/terrains-a-vendre-dakar/"
+VISIBILITY_TIMEOUT = 300  # secondes avant qu'une tâche louée redevienne visible
+MAX_ATTEMPTS = 3
+
+
+def task_id_for(kind, url, *extra):
+    """
+    Identifiant stable d'une tâche: la même URL (normalisée, voir
+    crawl_frontier.normalize_url) n'est mise en file qu'une fois
+    """
+    key = ':'.join([kind, normalize_url(url), *map(str, extra)])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class SQLiteWorkQueue:
+    """File de tâches persistante dans un fichier SQLite (plusieurs processus locaux)"""
+
+    def __init__(self, path=QUEUE_DB, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, lease_expires);
+            CREATE TABLE IF NOT EXISTS results (
+                task_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """)
+
+    def put(self, kind, payload, task_id=None):
+        """Ajoute une tâche; ignorée si une tâche de même identifiant existe déjà"""
+        task_id = task_id or task_id_for(kind, payload['url'])
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO tasks (id, kind, payload) VALUES (?, ?, ?)",
+            (task_id, kind, json.dumps(payload, ensure_ascii=False))
+        )
+        return cursor.rowcount > 0
+
+    def lease(self, worker_id):
+        """
+        Loue la prochaine tâche disponible (en attente ou dont le bail a expiré)
+
+        Une tâche dont le bail expire après max_attempts essais (worker mort ou
+        bloqué à chaque fois) est abandonnée au lieu d'être relouée.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL, lease_expires = NULL, "
+                "error = 'bail expiré' WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT id, kind, payload, attempts FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY kind = 'detail', rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now + self.visibility_timeout, row[0])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]), 'attempts': row[3] + 1}
+
+    def complete(self, task_id, result, worker_id):
+        """
+        Enregistre le résultat (idempotent) et marque la tâche comme terminée
+
+        Sans effet si le worker n'est plus titulaire du bail (tâche relouée
+        par un autre worker); retourne True si le résultat a été enregistré.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = self.conn.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (task_id, worker_id)
+            ).rowcount
+            if updated:
+                kind = self.conn.execute("SELECT kind FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO results (task_id, kind, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (task_id, kind, json.dumps(result, ensure_ascii=False), time.time())
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return bool(updated)
+
+    def fail(self, task_id, error, worker_id, max_attempts=None):
+        """Remet la tâche en attente, ou l'abandonne après max_attempts essais (titulaire du bail seulement)"""
+        max_attempts = max_attempts or self.max_attempts
+        return bool(self.conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, error = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (max_attempts, str(error), task_id, worker_id)
+        ).rowcount)
+
+    def stats(self):
+        """Nombre de tâches par statut"""
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def results(self, kind='detail'):
+        """Résultats enregistrés pour un type de tâche"""
+        rows = self.conn.execute(
+            "SELECT data FROM results WHERE kind = ? ORDER BY rowid", (kind,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+class RedisWorkQueue:
+    """
+    File de tâches sur un serveur compatible Redis (plusieurs conteneurs)
+
+    Chaque transition (mise en file, bail, acquittement, échec) est un script
+    Lua exécuté atomiquement: un worker qui meurt en cours de route ne peut pas
+    laisser une tâche hors des files d'attente et hors des baux.
+    """
+
+    # KEYS: tasks, kinds, status, pending:listing, pending:detail
+    PUT_SCRIPT = """
+        if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then return 0 end
+        redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+        redis.call('HSET', KEYS[3], ARGV[1], 'pending')
+        redis.call('RPUSH', ARGV[3] == 'listing' and KEYS[4] or KEYS[5], ARGV[1])
+        return 1
+    """
+
+    # KEYS: pending:listing, pending:detail, leases, status, attempts, owners, kinds, errors
+    # ARGV: maintenant, expiration du bail, worker, nombre maximum d'essais
+    LEASE_SCRIPT = """
+        for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], 0, ARGV[1])) do
+            redis.call('ZREM', KEYS[3], id)
+            redis.call('HDEL', KEYS[6], id)
+            if tonumber(redis.call('HGET', KEYS[5], id) or '0') >= tonumber(ARGV[4]) then
+                redis.call('HSET', KEYS[4], id, 'failed')
+                redis.call('HSET', KEYS[8], id, 'bail expiré')
+            else
+                redis.call('HSET', KEYS[4], id, 'pending')
+                redis.call('RPUSH', redis.call('HGET', KEYS[7], id) == 'listing' and KEYS[1] or KEYS[2], id)
+            end
+        end
+        local id = redis.call('LPOP', KEYS[1]) or redis.call('LPOP', KEYS[2])
+        if not id then return false end
+        redis.call('ZADD', KEYS[3], ARGV[2], id)
+        redis.call('HSET', KEYS[4], id, 'leased')
+        redis.call('HSET', KEYS[6], id, ARGV[3])
+        return {id, redis.call('HINCRBY', KEYS[5], id, 1)}
+    """
+
+    # KEYS: owners, status, leases, results:<kind>; ARGV: tâche, worker, résultat
+    COMPLETE_SCRIPT = """
+        if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2]
+                or redis.call('HGET', KEYS[2], ARGV[1]) ~= 'leased' then return 0 end
+        redis.call('HSET', KEYS[4], ARGV[1], ARGV[3])
+        redis.call('HSET', KEYS[2], ARGV[1], 'done')
+        redis.call('ZREM', KEYS[3], ARGV[1])
+        redis.call('HDEL', KEYS[1], ARGV[1])
+        return 1
+    """
+
+    # KEYS: owners, status, leases, attempts, kinds, errors, pending:listing, pending:detail
+    # ARGV: tâche, worker, nombre maximum d'essais, erreur
+    FAIL_SCRIPT = """
+        if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2]
+                or redis.call('HGET', KEYS[2], ARGV[1]) ~= 'leased' then return 0 end
+        redis.call('ZREM', KEYS[3], ARGV[1])
+        redis.call('HDEL', KEYS[1], ARGV[1])
+        redis.call('HSET', KEYS[6], ARGV[1], ARGV[4])
+        if tonumber(redis.call('HGET', KEYS[4], ARGV[1]) or '0') >= tonumber(ARGV[3]) then
+            redis.call('HSET', KEYS[2], ARGV[1], 'failed')
+        else
+            redis.call('HSET', KEYS[2], ARGV[1], 'pending')
+            redis.call('RPUSH', redis.call('HGET', KEYS[5], ARGV[1]) == 'listing' and KEYS[7] or KEYS[8], ARGV[1])
+        end
+        return 1
+    """
+
+    def __init__(self, url=QUEUE_URL, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS,
+                 namespace='keur_immo'):
+        import redis  # importé à la demande: inutile pour la file SQLite locale
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.ns = namespace
+        self._put = self.redis.register_script(self.PUT_SCRIPT)
+        self._lease = self.redis.register_script(self.LEASE_SCRIPT)
+        self._complete = self.redis.register_script(self.COMPLETE_SCRIPT)
+        self._fail = self.redis.register_script(self.FAIL_SCRIPT)
+
+    def _key(self, name):
+        return f"{self.ns}:{name}"
+
+    def _pending_keys(self):
+        return [self._key('pending:listing'), self._key('pending:detail')]
+
+    def put(self, kind, payload, task_id=None):
+        task_id = task_id or task_id_for(kind, payload['url'])
+        task = json.dumps({'kind': kind, 'payload': payload}, ensure_ascii=False)
+        keys = [self._key('tasks'), self._key('kinds'), self._key('status')] + self._pending_keys()
+        return bool(self._put(keys=keys, args=[task_id, task, kind]))
+
+    def lease(self, worker_id):
+        now = time.time()
+        keys = self._pending_keys() + [self._key(name) for name in
+                                       ('leases', 'status', 'attempts', 'owners', 'kinds', 'errors')]
+        leased = self._lease(keys=keys, args=[now, now + self.visibility_timeout, worker_id, self.max_attempts])
+        if not leased:
+            return None
+        task_id, attempts = leased
+        task = json.loads(self.redis.hget(self._key('tasks'), task_id))
+        return {'id': task_id, 'kind': task['kind'], 'payload': task['payload'], 'attempts': int(attempts)}
+
+    def complete(self, task_id, result, worker_id):
+        kind = self.redis.hget(self._key('kinds'), task_id)
+        keys = [self._key('owners'), self._key('status'), self._key('leases'), self._key(f'results:{kind}')]
+        return bool(self._complete(keys=keys, args=[task_id, worker_id, json.dumps(result, ensure_ascii=False)]))
+
+    def fail(self, task_id, error, worker_id, max_attempts=None):
+        keys = [self._key(name) for name in ('owners', 'status', 'leases', 'attempts', 'kinds', 'errors')]
+        args = [task_id, worker_id, max_attempts or self.max_attempts, str(error)]
+        return bool(self._fail(keys=keys + self._pending_keys(), args=args))
+
+    def stats(self):
+        counts = {}
+        for status in self.redis.hvals(self._key('status')):
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def results(self, kind='detail'):
+        return [json.loads(data) for data in self.redis.hvals(self._key(f'results:{kind}'))]
+
+    def close(self):
+        self.redis.close()
+
+
+def open_queue(db=QUEUE_DB, url=QUEUE_URL, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Ouvre le backend Redis si une URL est fournie, sinon la file SQLite locale"""
+    if url:
+        return RedisWorkQueue(url, visibility_timeout=visibility_timeout)
+    return SQLiteWorkQueue(db, visibility_timeout=visibility_timeout)
+
+
+def seed(queue, target_url=DEFAULT_TARGET_URL):
+    """Met en file la première page de listing; elle découvrira les pages suivantes"""
+    added = queue.put('listing', {'url': target_url, 'target_url': target_url, 'discover_pages': True})
+    logger.info(f"Seed {'ajouté' if added else 'déjà présent'}: {target_url}")
+
+
+def process_task(queue, scraper, task, get_details=True):
+    """Exécute une tâche et retourne son résultat"""
+    payload = task['payload']
+
+    if task['kind'] == 'listing':
+        response = scraper.get_page(payload['url'])
+        if not response:
+            raise RuntimeError(f"Page de listing indisponible: {payload['url']}")
+        soup = scraper.parse_html(response.content)
+
+        if payload.get('discover_pages'):
+            total_pages = scraper.get_total_pages(soup)
+            for page_num in range(2, total_pages + 1):
+                page_url = f"{payload['target_url']}?page={page_num}"
+                queue.put('listing', {'url': page_url, 'target_url': payload['target_url']})
+
+        properties = scraper.parse_property_listing(soup)
+        for property_data in properties:
+            if get_details and property_data.get('lien', 'N/A') != 'N/A':
+                queue.put('detail', {'url': property_data['lien'], 'property': property_data})
+            else:
+                # Pas de page de détail: la propriété est un résultat à part entière
+                url = property_data.get('lien', 'N/A')
+                if url == 'N/A':
+                    # Sans lien, la propriété est identifiée par sa page de listing et son titre
+                    task_id = task_id_for('detail', payload['url'], property_data['titre'])
+                    queue.put('detail', {'url': f"{payload['url']}#{property_data['titre']}",
+                                         'property': property_data, 'skip_fetch': True}, task_id)
+                else:
+                    queue.put('detail', {'url': url, 'property': property_data, 'skip_fetch': True})
+        return {'url': payload['url'], 'proprietes': len(properties)}
+
+    if task['kind'] == 'detail':
+        property_data = dict(payload['property'])
+        if not payload.get('skip_fetch'):
+            details = scraper.get_detailed_property_info(payload['url'])
+            if not details:
+                raise RuntimeError(f"Page de détail indisponible: {payload['url']}")
+            property_data.update(details)
+            if 'decouverte_via' in property_data:
+                scraper.fill_from_details(property_data)
+            # Propriétés similaires: l'identifiant de tâche par URL évite les doublons
+            depth = payload.get('depth', 0) + 1
+            if depth <= SCRAPING_CONFIG['crawl_max_depth']:
+                for link in property_data.get('proprietes_similaires', []):
+                    queue.put('detail', {'url': link['lien'], 'depth': depth, 'property': {
+                        'titre': link['titre'], 'lien': link['lien'], 'decouverte_via': payload['url']}})
+        return property_data
+
+    raise ValueError(f"Type de tâche inconnu: {task['kind']}")
+
+
+def run_worker(db=QUEUE_DB, url=QUEUE_URL, worker_id=None, get_details=True,
+               delay=None, visibility_timeout=VISIBILITY_TIMEOUT, poll_interval=0.5):
+    """
+    Boucle d'un worker: loue, traite et acquitte les tâches jusqu'à épuisement de la file
+
+    Un worker inactif continue d'interroger la file tant qu'une tâche est louée
+    ailleurs, car elle peut encore en ajouter. Il ne s'arrête qu'une fois la file
+    vide, ou après visibility_timeout secondes d'inactivité: au-delà, les baux
+    encore ouverts ont expiré et leurs tâches auraient été relouées ici.
+    """
+    from keur_immo_scraper import KeurImmoScraper
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    delay = SCRAPING_CONFIG['delay_between_details'] if delay is None else delay
+    queue = open_queue(db, url, visibility_timeout)
+    scraper = KeurImmoScraper()
+    processed = 0
+    idle_since = None
+
+    try:
+        while True:
+            task = queue.lease(worker_id)
+            if task is None:
+                # La file peut encore grossir tant que d'autres workers ont des tâches en cours
+                if queue.stats().get('leased', 0) == 0:
+                    break
+                idle_since = idle_since or time.time()
+                if time.time() - idle_since > visibility_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+            idle_since = None
+
+            try:
+                result = process_task(queue, scraper, task, get_details=get_details)
+                if queue.complete(task['id'], result, worker_id):
+                    processed += 1
+                else:
+                    logger.warning(f"[{worker_id}] Bail perdu, résultat ignoré: {task['payload']['url']}")
+            except Exception as e:
+                logger.warning(f"[{worker_id}] Tâche {task['kind']} échouée ({task['payload']['url']}): {e}")
+                queue.fail(task['id'], e, worker_id)
+
+            # Pause entre les requêtes pour être respectueux (seulement si le site a été sollicité)
+            if not task['payload'].get('skip_fetch'):
+                time.sleep(delay)
+    finally:
+        queue.close()
+
+    logger.info(f"[{worker_id}] Terminé: {processed} tâches traitées")
+    return processed
+
+
+def run_workers(processes, **kwargs):
+    """Lance plusieurs workers locaux dans des processus séparés"""
+    if processes <= 1:
+        return run_worker(**kwargs)
+
+    workers = []
+    for i in range(processes):
+        worker_kwargs = dict(kwargs, worker_id=f"{socket.gethostname()}-{os.getpid()}-{i}")
+        process = multiprocessing.Process(target=run_worker, kwargs=worker_kwargs)
+        process.start()
+        workers.append(process)
+    for process in workers:
+        process.join()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='File de travail distribuée pour keur-immo.com')
+    parser.add_argument('--db', default=QUEUE_DB, help='Fichier SQLite de la file locale')
+    parser.add_argument('--queue-url', default=QUEUE_URL,
+                        help='URL Redis (ex: redis://host:6379/0); prioritaire sur --db')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='Mettre en file la première page de listing')
+    seed_parser.add_argument('--url', default=DEFAULT_TARGET_URL, help='URL de listing à scraper')
+
+    worker_parser = subparsers.add_parser('worker', help='Traiter les tâches de la file')
+    worker_parser.add_argument('--processes', type=int, default=1, help='Nombre de workers locaux')
+    worker_parser.add_argument('--no-details', action='store_true',
+                               help='Ne pas récupérer les pages de détail')
+    worker_parser.add_argument('--delay', type=float, default=None,
+                               help='Pause (s) entre deux tâches pour chaque worker')
+    worker_parser.add_argument('--visibility-timeout', type=int, default=VISIBILITY_TIMEOUT,
+                               help='Durée (s) du bail avant remise en file')
+
+    export_parser = subparsers.add_parser('export', help='Exporter les propriétés récupérées')
+    export_parser.add_argument('--output', default='keur_immo_terrains.json', help='Fichier JSON de sortie')
+
+    subparsers.add_parser('stats', help='Afficher l\'état de la file')
+
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        run_workers(args.processes, db=args.db, url=args.queue_url,
+                    get_details=not args.no_details, delay=args.delay,
+                    visibility_timeout=args.visibility_timeout)
+        return
+
+    queue = open_queue(args.db, args.queue_url)
+    try:
+        if args.command == 'seed':
+            seed(queue, args.url)
+        elif args.command == 'export':
+            properties = queue.results('detail')
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(properties, f, ensure_ascii=False, indent=2)
+            logger.info(f"{len(properties)} propriétés exportées dans {args.output}")
+        elif args.command == 'stats':
+            print(json.dumps(queue.stats(), indent=2))
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()